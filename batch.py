@@ -0,0 +1,612 @@
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from board import Board, FlowField, EMPTY, PLAYER, FOOD_NONE, FOOD_NORMAL, FOOD_GOLD
+from engine import (Engine, GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, DIFFICULTY_SETTINGS, FOOD_COUNT, GOLDEN_FOOD_MAX,
+                    GOLDEN_FOOD_CHANCE, GOLDEN_FOOD_FRAME_MS, COMBO_WINDOW, RESPAWN_TRIES, ROOM_LIMIT, boost_delay)
+
+MAX_BATCH_WIDTH = 64  # 距离场把每行压成一个 uint64 位串
+
+# --- 1. 编码约定 ---
+# 方向编号与 engine.DIRECTIONS 顺序一致: 0=UP 1=DOWN 2=LEFT 3=RIGHT, -1 表示保持原方向
+DIR_DX = np.array([d[0] for d in DIRECTIONS])
+DIR_DY = np.array([d[1] for d in DIRECTIONS])
+OPPOSITE = np.array([DIRECTIONS.index((-d[0], -d[1])) for d in DIRECTIONS])
+DIR_UP, DIR_DOWN, DIR_LEFT, DIR_RIGHT = 0, 1, 2, 3
+
+# 占用格编号和食物种类沿用 board 模块: 0 空, 1 玩家, 2.. 敌人 (蛇编号 s 对应占用值 s + 1)
+
+# 死因编号
+CAUSE_NONE = 0
+CAUSE_WALL = 1
+CAUSE_SELF = 2
+CAUSE_ENEMY = 3
+CAUSES = {"wall": CAUSE_WALL, "self": CAUSE_SELF, "enemy": CAUSE_ENEMY}
+
+
+# --- 2. 批量模拟器 ---
+class BatchEngine:
+    """用 NumPy 数组同时推进 N 个棋盘，规则与 engine.Engine 一致
+
+    每个棋盘一张占用格 (格子 -> 蛇编号) 和食物格；蛇身是长度为 W*H 的环形缓冲，
+    推进时只改蛇头和蛇尾所在的格子。所有棋盘共用同一难度。
+    棋盘大小和食物数按难度配置 (与 Engine 相同)，显式给出的 width / height 优先。
+    """
+
+    def __init__(self, n, difficulty="NORMAL", width=None, height=None, seed=None):
+        self.settings = DIFFICULTY_SETTINGS[difficulty]
+        width = width or self.settings.get("width", GRID_WIDTH)
+        height = height or self.settings.get("height", GRID_HEIGHT)
+        if width > MAX_BATCH_WIDTH:
+            raise ValueError(f"{difficulty} board is {width} cells wide; "
+                             f"BatchEngine packs rows into uint64 and supports at most {MAX_BATCH_WIDTH}")
+        self.n = n
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.difficulty = difficulty
+        self.food_count = self.settings.get("food", FOOD_COUNT)
+        self.n_enemies = self.settings["enemies"]
+        self.n_snakes = 1 + self.n_enemies
+        self.base_speed = self.settings["speed"]
+        self.golden_chance = GOLDEN_FOOD_CHANCE
+        self.rng = np.random.default_rng(seed)
+
+        cell_xs = np.arange(self.cells)
+        self.cell_x = cell_xs % width
+        self.cell_y = cell_xs // width
+        # 每个格子四个方向的邻格 (越界处记 0，并由 nb_ok 屏蔽)
+        nx = self.cell_x[:, None] + DIR_DX[None, :]
+        ny = self.cell_y[:, None] + DIR_DY[None, :]
+        self.nb_ok = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        self.nb = np.where(self.nb_ok, ny * width + nx, 0)
+
+        self.occ = np.zeros((n, self.cells), dtype=np.int16)
+        self.food = np.zeros((n, self.cells), dtype=np.int8)
+        # 食物格的紧凑列表 (-1 为空位)，让最近食物查询只看几个格子而不是整张棋盘
+        self.food_slots = np.full((n, self.food_count + GOLDEN_FOOD_MAX), -1, dtype=np.int64)
+        self.body = np.zeros((n, self.n_snakes, self.cells), dtype=np.int32)
+        self.head = np.zeros((n, self.n_snakes), dtype=np.int32)
+        self.length = np.zeros((n, self.n_snakes), dtype=np.int32)
+        self.direction = np.zeros((n, self.n_snakes), dtype=np.int64)
+        self.alive = np.zeros((n, self.n_snakes), dtype=bool)
+
+        self.score = np.zeros(n, dtype=np.int64)
+        self.combo = np.zeros(n, dtype=np.int64)
+        self.last_gold_time = np.zeros(n, dtype=np.int64)
+        self.time_ms = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.boost = np.zeros(n, dtype=bool)
+        self.n_gold = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    # ---- 环形蛇身 ----
+    def head_cell(self, boards, s):
+        return self.body[boards, s, self.head[boards, s]]
+
+    def push_head(self, boards, s, cells):
+        h = (self.head[boards, s] - 1) % self.cells
+        self.head[boards, s] = h
+        self.body[boards, s, h] = cells
+        self.length[boards, s] += 1
+        self.occ[boards, cells] = s + 1
+
+    def pop_tail(self, boards, s):
+        t = (self.head[boards, s] + self.length[boards, s] - 1) % self.cells
+        cells = self.body[boards, s, t]
+        self.occ[boards, cells] = EMPTY
+        self.length[boards, s] -= 1
+        return cells
+
+    def clear_snake(self, boards, s):
+        if len(boards) == 0: return
+        span = np.arange(self.length[boards, s].max())
+        idx = (self.head[boards, s][:, None] + span[None, :]) % self.cells
+        mask = span[None, :] < self.length[boards, s][:, None]
+        rows = np.broadcast_to(boards[:, None], idx.shape)
+        self.occ[rows[mask], self.body[rows[mask], s, idx[mask]]] = EMPTY
+        self.length[boards, s] = 0
+
+    def snake_cells(self, board, s):
+        """按蛇头到蛇尾的顺序返回 (x, y) 列表"""
+        idx = (self.head[board, s] + np.arange(self.length[board, s])) % self.cells
+        return [(int(c % self.width), int(c // self.width)) for c in self.body[board, s, idx]]
+
+    def spawn_food(self, boards, kind):
+        """在每个棋盘上随机放一个食物 (避开所有蛇和已有食物，与 Engine.get_random_pos 相同)
+
+        先做几轮整体拒绝采样，剩下的棋盘 (几乎被占满) 再对全部空格精确抽取。
+        返回成功放下食物的棋盘。
+        """
+        placed = [boards[:0]]
+        pending = boards
+        for _ in range(8):
+            if len(pending) == 0: break
+            cells = self.rng.integers(0, self.cells, len(pending))
+            ok = (self.occ[pending, cells] == EMPTY) & (self.food[pending, cells] == FOOD_NONE)
+            self.put_food(pending[ok], cells[ok], kind)
+            placed.append(pending[ok])
+            pending = pending[~ok]
+        if len(pending):
+            allowed = (self.occ[pending] == EMPTY) & (self.food[pending] == FOOD_NONE)
+            keys = self.rng.random(allowed.shape)
+            keys[~allowed] = -1
+            cells = keys.argmax(1)
+            ok = allowed[np.arange(len(pending)), cells]
+            self.put_food(pending[ok], cells[ok], kind)
+            placed.append(pending[ok])
+        return np.concatenate(placed)
+
+    def put_food(self, boards, cells, kind):
+        self.food[boards, cells] = kind
+        slot = (self.food_slots[boards] < 0).argmax(1)
+        self.food_slots[boards, slot] = cells
+
+    def take_food(self, boards, cells):
+        """吃掉 cells 上的食物 (可能没有)，返回各格原来的食物种类"""
+        kind = self.food[boards, cells]
+        self.food[boards, cells] = FOOD_NONE
+        hit = self.food_slots[boards] == cells[:, None]
+        self.food_slots[boards] = np.where(hit, -1, self.food_slots[boards])
+        return kind
+
+    # ---- 开局 ----
+    def reset(self, mask=None):
+        boards = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if len(boards) == 0: return
+        self.occ[boards] = EMPTY
+        self.food[boards] = FOOD_NONE
+        self.food_slots[boards] = -1
+        self.head[boards] = 0
+        self.length[boards] = 0
+        self.alive[boards] = True
+
+        sx, sy = 4, self.height // 2
+        for k in (2, 1, 0):
+            self.push_head(boards, 0, np.full(len(boards), sy * self.width + sx - k))
+        self.direction[boards, 0] = DIR_RIGHT
+
+        for _ in range(self.food_count): self.spawn_food(boards, FOOD_NORMAL)
+        for s in range(1, self.n_snakes): self.spawn_enemy(boards, s)
+
+        self.score[boards] = 0
+        self.combo[boards] = 0
+        self.last_gold_time[boards] = -COMBO_WINDOW
+        self.time_ms[boards] = 0
+        self.ticks[boards] = 0
+        self.boost[boards] = False
+        self.n_gold[boards] = 0
+
+    def spawn_enemy(self, boards, s):
+        """与 EnemySnake.respawn 相同：x >= 10 处横向三个既无蛇也无食物的格子、朝左
+
+        先随机试 RESPAWN_TRIES 轮，仍未放下的棋盘再对全部合法位置精确抽取；
+        没有合法位置的棋盘上这条敌蛇保持死亡。
+        """
+        self.alive[boards, s] = False
+        if self.width - 3 < 10: return
+        pending = boards
+        for _ in range(RESPAWN_TRIES):
+            if len(pending) == 0: return
+            x = self.rng.integers(10, self.width - 2, len(pending))
+            y = self.rng.integers(0, self.height, len(pending))
+            c = y * self.width + x
+            free = (self.occ[pending, c] == EMPTY) & (self.occ[pending, c + 1] == EMPTY) & \
+                   (self.occ[pending, c + 2] == EMPTY) & (self.food[pending, c] == FOOD_NONE) & \
+                   (self.food[pending, c + 1] == FOOD_NONE) & (self.food[pending, c + 2] == FOOD_NONE)
+            self.place_enemy(pending[free], s, c[free])
+            pending = pending[~free]
+        if len(pending) == 0: return
+        k = len(pending)
+        vacant = ((self.occ[pending] == EMPTY) & (self.food[pending] == FOOD_NONE)).reshape(k, self.height, self.width)
+        spot = np.zeros_like(vacant)
+        spot[:, :, 10:-2] = vacant[:, :, 10:-2] & vacant[:, :, 11:-1] & vacant[:, :, 12:]
+        spot = spot.reshape(k, self.cells)
+        keys = self.rng.random(spot.shape)
+        keys[~spot] = -1
+        c = keys.argmax(1)
+        ok = spot[np.arange(k), c]
+        self.place_enemy(pending[ok], s, c[ok])
+
+    def place_enemy(self, boards, s, cells):
+        for k in (2, 1, 0): self.push_head(boards, s, cells + k)
+        self.direction[boards, s] = DIR_LEFT
+        self.alive[boards, s] = True
+
+    def load_engine(self, board, engine):
+        """把标量 Engine 的当前状态载入第 board 个棋盘"""
+        assert len(engine.enemies) == self.n_enemies
+        b = np.array([board])
+        self.occ[board] = EMPTY
+        self.food[board] = FOOD_NONE
+        self.food_slots[board] = -1
+        snakes = [(engine.snake, engine.direction, engine.alive)] + \
+                 [(e.body, e.direction, e.alive) for e in engine.enemies]
+        for s, (body, direction, alive) in enumerate(snakes):
+            self.head[board, s] = 0
+            self.length[board, s] = 0
+            self.direction[board, s] = DIRECTIONS.index(direction)
+            self.alive[board, s] = alive
+            if alive or s == 0:
+                for x, y in reversed(list(body)): self.push_head(b, s, np.array([y * self.width + x]))
+        for x, y in engine.foods: self.put_food(b, np.array([y * self.width + x]), FOOD_NORMAL)
+        for x, y in engine.golden_foods: self.put_food(b, np.array([y * self.width + x]), FOOD_GOLD)
+        self.score[board] = engine.score
+        self.combo[board] = engine.combo_count
+        self.last_gold_time[board] = engine.last_gold_time
+        self.time_ms[board] = engine.time_ms
+        self.ticks[board] = engine.ticks
+        self.boost[board] = engine.is_boosting
+        self.n_gold[board] = len(engine.golden_foods)
+
+    # ---- 推进 ----
+    def step(self, actions, boost=None, enemy_actions=None):
+        """所有棋盘各推进一次移动
+
+        actions: 每个棋盘的玩家方向编号 (-1 保持)；boost: 每个棋盘是否加速；
+        enemy_actions: 可选的 [N, 敌人数] 方向编号，>= 0 时代替内置 AI (用于回放或对拍)。
+        返回事件数组字典；玩家已死的棋盘保持不变，需要调用 reset(mask) 重开。
+        """
+        n = self.n
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64), (n,))
+        if boost is not None: self.boost[:] = boost
+        events = {
+            "food": np.zeros(n, dtype=bool), "golden": np.zeros(n, dtype=bool),
+            "death": np.zeros(n, dtype=bool), "cause": np.zeros(n, dtype=np.int8),
+            "enemy_deaths": np.zeros(n, dtype=np.int64)
+        }
+
+        active = self.alive[:, 0].copy()
+        cur = self.direction[:, 0]
+        turn = active & (actions >= 0) & (actions != OPPOSITE[cur])
+        self.direction[turn, 0] = actions[turn]
+
+        delay = np.where(self.boost, boost_delay(self.base_speed), self.base_speed)
+        self.ticks[active] += 1
+        self.time_ms[active] += delay[active]
+
+        chance = 1 - (1 - self.golden_chance) ** (delay / GOLDEN_FOOD_FRAME_MS)
+        roll = active & (self.rng.random(n) < chance) & (self.n_gold < GOLDEN_FOOD_MAX)
+        self.n_gold[self.spawn_food(np.flatnonzero(roll), FOOD_GOLD)] += 1
+
+        # 玩家
+        b = np.flatnonzero(active)
+        head = self.head_cell(b, 0)
+        d = self.direction[b, 0]
+        nx = self.cell_x[head] + DIR_DX[d]
+        ny = self.cell_y[head] + DIR_DY[d]
+        wall = (nx < 0) | (nx >= self.width) | (ny < 0) | (ny >= self.height)
+        new = np.where(wall, 0, ny * self.width + nx)
+        owner = np.where(wall, EMPTY, self.occ[b, new])
+        dead = wall | (owner != EMPTY)
+        died = b[dead]
+        self.alive[died, 0] = False
+        events["death"][died] = True
+        events["cause"][died] = np.where(wall[dead], CAUSE_WALL,
+                                         np.where(owner[dead] == PLAYER, CAUSE_SELF, CAUSE_ENEMY))
+
+        moved = b[~dead]
+        new = new[~dead]
+        self.push_head(moved, 0, new)
+        kind = self.take_food(moved, new)
+
+        ate = moved[kind == FOOD_NORMAL]
+        self.score[ate] += 10
+        events["food"][ate] = True
+        self.spawn_food(ate, FOOD_NORMAL)
+
+        gold = moved[kind == FOOD_GOLD]
+        self.score[gold] += 50
+        self.n_gold[gold] -= 1
+        events["golden"][gold] = True
+        within = self.time_ms[gold] - self.last_gold_time[gold] < COMBO_WINDOW
+        self.combo[gold] = np.where(within, self.combo[gold] + 1, 1)
+        self.last_gold_time[gold] = self.time_ms[gold]
+
+        self.pop_tail(moved[kind == FOOD_NONE], 0)
+
+        # 距离场按玩家移动后的局面算一次；敌人按编号依次移动，后移动的能看到先移动者的新位置
+        # free 为各棋盘空格的位串，敌人移动时随之增量更新，供数连通空间使用
+        field = free = None
+        if enemy_actions is None or (np.asarray(enemy_actions)[moved] < 0).any():
+            free = np.zeros((n, self.height), dtype=np.uint64)
+            free[moved] = self.pack_rows(self.occ[moved] == EMPTY)
+            field = np.full((n, self.n_enemies, 4), -1, dtype=np.int32)
+            field[moved] = self.flow_field(moved, free[moved])
+        for s in range(1, self.n_snakes):
+            eb = moved[self.alive[moved, s]]
+            if len(eb) == 0: continue
+            head = self.head_cell(eb, s)
+            cur = self.direction[eb, s]
+            cand = self.nb[head]
+            safe = self.nb_ok[head] & (self.occ[eb[:, None], cand] == EMPTY)
+            safe &= np.arange(4)[None, :] != OPPOSITE[cur][:, None]
+
+            if field is not None:
+                choice, trapped = self.enemy_choice(eb, s, head, cand, safe, field[eb, s - 1], free[eb])
+            else:
+                choice, trapped = np.zeros(len(eb), dtype=np.int64), ~safe.any(1)
+            if enemy_actions is not None:
+                forced = np.asarray(enemy_actions)[eb, s - 1]
+                use = forced >= 0
+                choice = np.where(use, forced, choice)
+                trapped = np.where(use, ~safe[np.arange(len(eb)), np.maximum(forced, 0)], trapped)
+
+            stuck = eb[trapped]
+            self.alive[stuck, s] = False
+            self.clear_snake(stuck, s)
+            events["enemy_deaths"][stuck] += 1
+            if free is not None: free[stuck] = self.pack_rows(self.occ[stuck] == EMPTY)
+
+            go = ~trapped
+            eb, choice = eb[go], choice[go]
+            new = cand[go, choice]
+            self.direction[eb, s] = choice
+            self.push_head(eb, s, new)
+            kind = self.take_food(eb, new)
+            self.spawn_food(eb[kind == FOOD_NORMAL], FOOD_NORMAL)
+            self.n_gold[eb[kind == FOOD_GOLD]] -= 1
+            shrink = eb[kind == FOOD_NONE]
+            tail = self.pop_tail(shrink, s)
+            if free is not None:
+                self.set_bits(free, eb, new, False)
+                self.set_bits(free, shrink, tail, True)
+
+        return events
+
+    def flow_field(self, boards, free=None):
+        """与 FlowField 相同的多源 BFS：从食物出发逐层膨胀，穿过空格
+
+        每行格子压成一个 uint64 位串，逐层膨胀只需移位和按位运算；
+        只记录各敌蛇蛇头四个邻格被标注时的层数，返回 [len(boards), 敌人数, 4]，-1 表示未标注。
+        每个棋盘在它的每条活着的敌蛇都有邻格被标注 (或无处可扩) 后停止。
+        free 为这些棋盘已压好的空格位串，不给时现算。
+        """
+        k = len(boards)
+        out = np.full((k, self.n_enemies, 4), -1, dtype=np.int32)
+
+        # 以下数组只保留仍在扩展的棋盘，rows 记录它们在结果中的行号
+        rows = np.arange(k)
+        if free is None: free = self.pack_rows(self.occ[boards] == EMPTY)
+        frontier = self.pack_rows(self.food[boards] != FOOD_NONE)
+        seen = frontier.copy()
+        alive = self.alive[boards, 1:]
+        heads = self.body[boards[:, None], np.arange(1, self.n_snakes)[None, :], self.head[boards, 1:]]
+        watch = self.nb[heads]
+        watch_ok = self.nb_ok[heads] & alive[:, :, None]
+        wx, wy = self.cell_x[watch].astype(np.uint64), self.cell_y[watch]
+        dist = np.where(watch_ok & self.has_bit(frontier, wx, wy), 0, -1).astype(np.int32)
+
+        d = 0
+        while len(rows):
+            going = (alive & ~(dist >= 0).any(2)).any(1) & frontier.any(1)
+            # 已完成的棋盘先冻结结果，剩余不足八成时再压缩数组，减少复制
+            watch_ok &= going[:, None, None]
+            if going.sum() < 0.8 * len(rows):
+                out[rows[~going]] = dist[~going]
+                rows, dist, free, seen, frontier = rows[going], dist[going], free[going], seen[going], frontier[going]
+                alive, watch_ok, wx, wy = alive[going], watch_ok[going], wx[going], wy[going]
+                if not len(rows): break
+            d += 1
+            frontier = self.spread(frontier) & free & ~seen
+            seen |= frontier
+            dist[watch_ok & (dist < 0) & self.has_bit(frontier, wx, wy)] = d
+        out[rows] = dist
+        return out
+
+    def room(self, free, cells, need):
+        """与 Board.room 相同：在 free (各棋盘空格的位串) 上从 cells 出发数连通的空格 (含起点)，数到 need 个为止
+
+        同样按位串逐层膨胀，数够或无处可扩的棋盘随即退出。
+        """
+        out = np.ones(len(free), dtype=np.int64)
+        lanes = np.flatnonzero(need > 1)
+        free = free[lanes]
+        seen = np.zeros_like(free)
+        seen[np.arange(len(lanes)), self.cell_y[cells[lanes]]] = np.uint64(1) << self.cell_x[cells[lanes]].astype(np.uint64)
+        count, need = out[lanes], need[lanes]
+        while len(lanes):
+            seen |= self.spread(seen) & free
+            total = np.bitwise_count(seen).sum(1, dtype=np.int64)
+            out[lanes] = np.minimum(total, need)
+            going = (total > count) & (total < need)
+            lanes, seen, free, count, need = lanes[going], seen[going], free[going], total[going], need[going]
+        return out
+
+    def spread(self, rows_bits):
+        """位串向上下左右各膨胀一格 (不含自身)"""
+        grow = (rows_bits << np.uint64(1)) | (rows_bits >> np.uint64(1))
+        grow[:, 1:] |= rows_bits[:, :-1]
+        grow[:, :-1] |= rows_bits[:, 1:]
+        return grow
+
+    def set_bits(self, rows_bits, boards, cells, on):
+        """把各棋盘位串中 cells 对应的位置 1 或清 0 (每个棋盘至多一格)"""
+        bit = np.uint64(1) << self.cell_x[cells].astype(np.uint64)
+        y = self.cell_y[cells]
+        if on:
+            rows_bits[boards, y] |= bit
+        else:
+            rows_bits[boards, y] &= ~bit
+
+    def pack_rows(self, mask):
+        """[k, W*H] 布尔数组 -> [k, H] 位串，第 x 位对应该行第 x 格 (越界位恒为 0)"""
+        packed = np.packbits(mask.reshape(len(mask), self.height, self.width), axis=2, bitorder="little")
+        rows = np.zeros((len(mask), self.height, 8), dtype=np.uint8)
+        rows[:, :, :packed.shape[2]] = packed
+        return rows.view("<u8")[:, :, 0].astype(np.uint64)
+
+    def has_bit(self, rows_bits, x, y):
+        picked = rows_bits[np.arange(len(rows_bits))[:, None, None], y]
+        return ((picked >> x) & np.uint64(1)).astype(bool)
+
+    def enemy_choice(self, boards, s, head, cand, safe, dist, free):
+        """与 EnemySnake.move 相同的选路
+
+        安全方向按 (距离场上到食物的距离, -出口数, 方向编号) 排序，依次数连通空间，
+        第一个装得下自己 (min(身长, ROOM_LIMIT) 格) 的即为所选，都装不下时取空间最大的；free 为当前的空格位串。
+        距离场没覆盖到的方向退回朝最近食物 (距离相同取 (y, x) 较小者，没有食物时取棋盘中心) 的曼哈顿距离。
+        """
+        k = len(boards)
+        rows = np.arange(k)
+        slots = self.food_slots[boards]
+        has_food = slots >= 0
+        fx, fy = self.cell_x[slots], self.cell_y[slots]
+        hx, hy = self.cell_x[head], self.cell_y[head]
+        manhattan = np.abs(fx - hx[:, None]) + np.abs(fy - hy[:, None])
+        nearest = np.where(has_food, manhattan * self.cells + slots, np.iinfo(np.int64).max).argmin(1)
+        none = ~has_food.any(1)
+        tx = np.where(none, self.width // 2, fx[rows, nearest])
+        ty = np.where(none, self.height // 2, fy[rows, nearest])
+        fallback = self.cells + np.abs(self.cell_x[cand] - tx[:, None]) + np.abs(self.cell_y[cand] - ty[:, None])
+        d = np.where(dist >= 0, dist, fallback).astype(np.int64)
+
+        around = self.nb[cand]
+        exits = (self.nb_ok[cand] & (self.occ[boards[:, None, None], around] == EMPTY)).sum(2)
+        key = (d * 8 + 4 - exits) * 4 + np.arange(4)[None, :]
+        key[~safe] = np.iinfo(np.int64).max
+        order = key.argsort(1)
+
+        # 多数情况下排第一的方向就装得下，只有它装不下的棋盘才去数其余方向
+        need = np.minimum(self.length[boards, s], ROOM_LIMIT)
+        room = np.full((k, 4), -1, dtype=np.int64)
+        first = order[:, 0]
+        room[rows, first] = self.room(free, cand[rows, first], need)
+        more = np.flatnonzero(room[rows, first] < need)
+        lanes, dirs = np.repeat(more, 3), order[more, 1:].ravel()
+        lanes, dirs = lanes[safe[lanes, dirs]], dirs[safe[lanes, dirs]]
+        if len(lanes): room[lanes, dirs] = self.room(free[lanes], cand[lanes, dirs], need[lanes])
+        room[~safe] = -1
+
+        ranked = np.take_along_axis(room, order, 1)
+        fits = ranked >= need[:, None]
+        pick = np.where(fits.any(1), fits.argmax(1), ranked.argmax(1))
+        return order[rows, pick], ~safe.any(1)
+
+
+# --- 3. 对拍 ---
+def check_parity(games=64, ticks=400, difficulty="HARD", seed=0):
+    """与 engine.Engine 对拍
+
+    每一步先把各个标量引擎的状态载入批量引擎并核对距离场，再用相同的玩家输入推进两边；
+    敌人由两边各自的 AI 选路，金色食物改为手动投放。食物重生点是随机的，
+    某个棋盘本步有食物重生时，之后移动的敌人看到的局面不同，该棋盘本步只比较玩家。
+    出现不一致时抛出 AssertionError，否则返回连同敌人一起比较过的棋盘步数。
+    单独运行用 python batch.py --check，bench.py 每次也会跑一遍。
+    """
+    rng = random.Random(seed)
+    engines = [Engine(difficulty, seed=seed + i) for i in range(games)]
+    batch = BatchEngine(games, difficulty, seed=seed)
+    batch.golden_chance = 0
+    field = FlowField(batch.width, batch.height)
+    compared = 0
+
+    for t in range(ticks):
+        for i, e in enumerate(engines):
+            if not e.alive: e.reset()
+            e.golden_chance = 0
+            if rng.random() < 0.2: e.add_golden_food()
+            batch.load_engine(i, e)
+        check_flow_field(batch, engines, field, f"tick {t}")
+
+        before = [set(e.foods) for e in engines]
+        actions = [rng.randrange(-1, 4) for _ in range(games)]
+        boosts = [rng.random() < 0.3 for _ in range(games)]
+        for e, a, boost in zip(engines, actions, boosts):
+            e.step(DIRECTIONS[a] if a >= 0 else None, boost)
+        batch.step(actions, boosts)
+
+        for i, e in enumerate(engines):
+            where = f"tick {t} board {i}"
+            assert bool(batch.alive[i, 0]) == e.alive, where
+            assert batch.score[i] == e.score and batch.combo[i] == e.combo_count, where
+            assert batch.time_ms[i] == e.time_ms, where
+            assert batch.snake_cells(i, 0) == list(e.snake), where
+            assert np.count_nonzero(batch.food[i] == FOOD_NORMAL) == len(e.foods), where
+            assert e.board.owner == expected_owner(e), where
+            assert sorted(e.board.free.cells) == expected_free(e), where
+            if set(e.foods) - before[i]: continue
+            for s, en in enumerate(e.enemies, 1):
+                assert bool(batch.alive[i, s]) == en.alive, f"{where} enemy {s}"
+                if not en.alive: continue
+                assert batch.direction[i, s] == DIRECTIONS.index(en.direction), f"{where} enemy {s}"
+                assert batch.snake_cells(i, s) == list(en.body), f"{where} enemy {s}"
+            golden = {(int(c % batch.width), int(c // batch.width)) for c in np.flatnonzero(batch.food[i] == FOOD_GOLD)}
+            assert golden == set(e.golden_foods), where
+            compared += 1
+    return compared
+
+
+def check_flow_field(batch, engines, field, where):
+    """批量距离场在各敌蛇蛇头邻格上的取值应与 FlowField.distance 完全一致"""
+    dist = batch.flow_field(np.arange(len(engines)))
+    for i, e in enumerate(engines):
+        heads = [en.body[0] for en in e.enemies if en.alive]
+        if not heads: continue
+        field.compute(e.board, e.food.kind, heads)
+        for s, en in enumerate(e.enemies):
+            if not en.alive: continue
+            x, y = en.body[0]
+            for j, (dx, dy) in enumerate(DIRECTIONS):
+                pos = (x + dx, y + dy)
+                d = field.distance(pos) if 0 <= pos[0] < e.width and 0 <= pos[1] < e.height else None
+                assert dist[i, s, j] == (-1 if d is None else d), f"{where} board {i} enemy {s + 1}"
+
+
+def expected_owner(engine):
+    """按蛇身重新铺一遍占用格，用来校验增量维护的结果"""
+    board = Board(engine.width, engine.height)
+    for pos in engine.snake: board.occupy(pos, PLAYER)
+    for en in engine.enemies:
+        if en.alive:
+            for pos in en.body: board.occupy(pos, en.owner)
+    return board.owner
+
+
+def expected_free(engine):
+    foods = {y * engine.width + x for x, y in engine.food.kind}
+    return [c for c, owner in enumerate(engine.board.owner) if owner == EMPTY and c not in foods]
+
+
+def benchmark(n=4096, difficulty="HARD", seconds=3.0, seed=0):
+    """随机输入下的批量推进速度 (棋盘步/秒)"""
+    batch = BatchEngine(n, difficulty, seed=seed)
+    rng = np.random.default_rng(seed)
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        batch.step(rng.integers(-1, 4, n))
+        batch.reset(~batch.alive[:, 0])
+        steps += 1
+    return steps * n / (time.perf_counter() - start)
+
+
+def main_cli(argv=None):
+    """--check 只做对拍，不一致时以非零状态退出；不带参数时只测吞吐"""
+    parser = argparse.ArgumentParser(description="Batched snake simulator")
+    parser.add_argument("--check", action="store_true", help="compare against engine.Engine and exit non-zero on a mismatch")
+    parser.add_argument("--games", type=int, default=64, help="boards compared by --check")
+    parser.add_argument("--ticks", type=int, default=400, help="steps compared by --check")
+    parser.add_argument("--difficulty", default="HARD")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of the throughput benchmark")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        try:
+            compared = check_parity(args.games, args.ticks, args.difficulty, args.seed)
+        except AssertionError as e:
+            print(f"PARITY MISMATCH: {e}")
+            return 1
+        print(f"parity ok: {compared} board-steps compared")
+        return 0
+    print(f"throughput: {benchmark(difficulty=args.difficulty, seconds=args.seconds, seed=args.seed):.0f} board-steps/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
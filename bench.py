@@ -0,0 +1,379 @@
+"""性能基准：模拟速度、各主题帧耗时、大量粒子、长蛇场景、稳态内存分配
+
+在 SDL dummy 驱动下运行，结果写成 JSON；计时项重复数遍取中位数，存在基准文件时逐项比较，
+超出容差即列出退化项并以非零状态退出。稳态下每帧、每个 tick 的内存分配
+不与基准比较，而是按难度各有绝对上限 (ALLOC_LIMITS)，超出同样以非零状态退出。批量模拟器与 Engine 的对拍
+(batch.check_parity) 也在这里跑一遍，不一致时同样失败。
+
+    python bench.py                    # 运行并与 bench_baseline.json 比较
+    python bench.py --update-baseline  # 把本次结果存为新的基准
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import batch
+import main
+from board import PLAYER, SnakeBody
+from particles import ParticleSystem, MAX_PARTICLES
+from engine import Engine, DIRECTIONS, DIFFICULTY_SETTINGS, RIGHT
+
+RESULTS_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+TOLERANCE = 0.25  # 比基准差 25% 以上算退化
+REPEATS = 3  # 模拟和帧耗时各跑几遍，取中位数再与基准比较
+LONG_SNAKE = 400
+ALLOC_STEPS = 1000
+KEYFRAME_STEPS = 20
+# 各难度稳态下平均每帧 / 每个 tick 允许的 Python 堆净增字节，以及单帧内允许的堆峰值 (KB)。
+# 峰值最大的是存回放关键帧的那一帧，与快照大小成正比，随棋盘面积、敌人数量和对局长度增长
+# (本基准固定种子下实测 HARD 约 50 KB、LARGE 约 220 KB、ARENA 约 2 MB)，这些上限只针对本基准的局面，
+# 不是任意对局都成立的保证；ARENA 的几百条敌蛇吃到食物后变长、蛇身缓冲区翻倍扩容，净增 (实测约 340 字节) 也比其他难度高
+ALLOC_LIMITS = {
+    "EASY": (64, 96),
+    "NORMAL": (64, 96),
+    "HARD": (64, 96),
+    "LARGE": (64, 384),
+    "ARENA": (1024, 3072),
+}
+GOLDEN_RATE = 0.01  # play 场景里每个 tick 补一个金色食物的概率，让连击飘字持续出现
+
+
+# --- 1. 模拟 ---
+def safe_direction(engine, rng):
+    """随机选一个不会立刻撞死的方向，让对局尽量长"""
+    hx, hy = engine.snake[0]
+    safe = [d for d in DIRECTIONS if engine.board.is_free((hx + d[0], hy + d[1]))]
+    return rng.choice(safe) if safe else None
+
+
+def food_direction(engine):
+    """朝最近食物走的安全方向，让吃食物的事件持续发生；没有安全方向时返回 None"""
+    hx, hy = engine.snake[0]
+    safe = [d for d in DIRECTIONS if engine.board.is_free((hx + d[0], hy + d[1]))]
+    target = engine.food.nearest((hx, hy))
+    if not safe or target is None: return safe[0] if safe else None
+    return min(safe, key=lambda d: abs(hx + d[0] - target[0]) + abs(hy + d[1] - target[1]))
+
+
+def bench_sim(difficulty, seconds, seed=0):
+    """Engine.step (含全部敌人移动) 每秒步数，死亡后立即重开"""
+    engine = Engine(difficulty, seed=seed)
+    rng = random.Random(seed)
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            if not engine.alive: engine.reset()
+            engine.step(safe_direction(engine, rng))
+        steps += 100
+    return steps / (time.perf_counter() - start)
+
+
+# --- 2. 绘制 ---
+def time_frames(game, frames, before=None):
+    """draw + 提交的平均毫秒数；before 在每帧绘制前调用"""
+    start = time.perf_counter()
+    for _ in range(frames):
+        if before: before()
+        game.draw()
+        game.dirty.present()
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def playing_game(difficulty="HARD", seed=0):
+    game = main.Game()
+    game.start_game(difficulty)
+    game.engine.reset(difficulty, seed)
+    rng = random.Random(seed)
+    for _ in range(30): game.engine.step(safe_direction(game.engine, rng))
+    return game
+
+
+def bench_themes(frames):
+    game = playing_game()
+    results = {}
+    for i, theme in enumerate(main.THEMES):
+        game.theme_index = i
+        results[theme["name"]] = time_frames(game, frames)
+    return results
+
+
+def bench_particles(frames):
+    """粒子池一直保持接近上限的场景"""
+    game = playing_game()
+
+    def burst():
+        game.create_confetti((15, 10))
+        game.create_particles((5, 5), main.COLOR_FOOD_NORMAL, count=20)
+        game.particles.update()
+
+    return time_frames(game, frames, burst)
+
+
+def serpentine(width, height, length):
+    """从左下角开始蛇形铺满的 length 个格子，蛇头在末端"""
+    cells = []
+    for row in range(height - 1, -1, -1):
+        xs = range(width) if (height - 1 - row) % 2 == 0 else range(width - 1, -1, -1)
+        cells.extend((x, row) for x in xs)
+    return cells[:length][::-1]
+
+
+def bench_long_snake(frames, length=LONG_SNAKE):
+    game = playing_game("EASY")
+    engine = game.engine
+    for enemy in engine.enemies:
+        if enemy.alive: enemy.die()
+    engine.board.release_all(engine.snake)
+    engine.snake = SnakeBody(serpentine(engine.width, engine.height, length))
+    for pos in engine.snake: engine.board.occupy(pos, PLAYER)
+    engine.direction = RIGHT
+    return time_frames(game, frames)
+
+
+def dirty_frames(dirty_rects, difficulty, frames, seed):
+    """经 Game.update 推进、每 tick 画一帧，返回每帧的屏幕像素"""
+    random.seed(seed)
+    game = main.Game(dirty_rects=dirty_rects)
+    game.start_game(difficulty)
+    game.engine.reset(difficulty, seed)
+    game.particles = ParticleSystem(MAX_PARTICLES, seed)
+    rng = random.Random(seed)
+    shots = []
+    for _ in range(frames):
+        if game.state != "PLAYING": break
+        game.next_direction = safe_direction(game.engine, rng) or game.next_direction
+        game.update()
+        game.draw()
+        game.dirty.present()
+        shots.append(pygame.image.tobytes(game.screen, "RGB"))
+    return shots
+
+
+def check_dirty_rects(difficulty="LARGE", frames=120, seed=123):
+    """脏矩形模式与整屏重画逐帧比较像素，返回不一致的帧数 (LARGE 的摄像机会停在亚格偏移处)"""
+    full = dirty_frames(False, difficulty, frames, seed)
+    dirty = dirty_frames(True, difficulty, frames, seed)
+    return sum(a != b for a, b in zip(full, dirty)) + abs(len(full) - len(dirty))
+
+
+# --- 3. 内存分配 ---
+SURFACE = pygame.Surface
+
+
+class CountingSurface(SURFACE):
+    """测量期间临时替换 pygame.Surface，统计绘制代码新建了多少个 Surface"""
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingSurface.created += 1
+        super().__init__(*args, **kwargs)
+
+
+def measure_allocations(step, count, setup=None, warmup=100, text=None):
+    """step 在稳态下平均每次的 (Python 堆净增字节, 单次峰值字节, 新建 Surface 个数, 文字缓存未命中数)
+
+    setup 在每次 step 之前调用 (如死亡后重开一局)，它的分配不计入。
+    给出 text (TextCache) 时统计期间新光栅化的文字，新文字合成描边图块是唯一允许的 Surface 新建。
+    """
+    for _ in range(warmup):
+        if setup: setup()
+        step()
+    created = CountingSurface.created
+    misses = text.misses if text else 0
+    net = peak = 0
+    pygame.Surface = CountingSurface
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            if setup: setup()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step()
+            after, top = tracemalloc.get_traced_memory()
+            net += after - before
+            peak = max(peak, top - before)
+    finally:
+        tracemalloc.stop()
+        pygame.Surface = SURFACE
+    misses = (text.misses - misses) / count if text else 0
+    return net / count, peak, (CountingSurface.created - created) / count, misses
+
+
+def bench_allocations(count, difficulty="HARD", seed=0):
+    """difficulty 下对局中的 tick、普通帧、带闪光 / 暂停 / 结束覆盖层和 F3 面板的帧，
+    经 Game.update 推进、不断吃到食物 (粒子、金色连击飘字) 的完整一帧，以及存一个回放关键帧"""
+    game = playing_game(difficulty, seed)
+    rng = random.Random(seed)
+    results = {}
+
+    def start():
+        # 死亡后在 setup 里直接重开，不走 game_over 的存档；关键帧是回放有意保留的数据，
+        # 由下面的 keyframe 场景单独量峰值，不计入 tick / play 的净增
+        if game.state != "PLAYING": game.start_game(difficulty)
+        game.recorder.interval = sys.maxsize
+
+    def restart():
+        start()
+        game.next_direction = safe_direction(game.engine, rng) or game.next_direction
+
+    def feed():
+        start()
+        if rng.random() < GOLDEN_RATE: game.engine.add_golden_food()
+        game.next_direction = food_direction(game.engine) or game.next_direction
+
+    def frame():
+        game.draw()
+        game.dirty.mark(game.profiler.draw(game.screen, game.text, game.mono_font))
+        game.dirty.present()
+
+    def play():
+        game.update()
+        frame()
+
+    scenes = {
+        "tick": (game.update, restart),
+        "frame": (frame, None),
+        "frame_overlays": (frame, lambda: setattr(game, "flash_effect", 10)),
+        "play": (play, feed),
+    }
+    for name, (step, setup) in scenes.items():
+        game.profiler.visible = name == "frame_overlays"
+        record_allocations(results, f"{difficulty}.{name}", *measure_allocations(step, count, setup, text=game.text))
+    game.profiler.visible = False
+
+    # 存下的快照本身不算净增，只看峰值
+    def keyframe():
+        game.recorder.replay.add_keyframe(game.engine.ticks, game.engine.snapshot())
+    peak = measure_allocations(keyframe, KEYFRAME_STEPS, game.recorder.replay.keyframes.clear, warmup=2)[1]
+    results[f"alloc.{difficulty}.keyframe.peak_kb"] = peak / 1024
+
+    for state in ("PAUSED", "GAMEOVER"):
+        game.state = state
+        record_allocations(results, f"{difficulty}.{state.lower()}", *measure_allocations(frame, count, text=game.text))
+    return results
+
+
+def record_allocations(results, name, net, peak, surfaces, misses):
+    results[f"alloc.{name}.bytes"] = net
+    results[f"alloc.{name}.peak_kb"] = peak / 1024
+    results[f"alloc.{name}.surfaces"] = surfaces
+    results[f"alloc.{name}.text_misses"] = misses
+
+
+def check_allocations(results, limits=ALLOC_LIMITS):
+    """超出所属难度上限的分配项 (键为 alloc.难度.场景.指标)：净增或峰值超过 limits 中该难度的值，
+    或新建的 Surface 多于新光栅化的文字"""
+    failures = []
+    for key, value in results.items():
+        if not key.startswith("alloc."): continue
+        limit, peak_limit = limits[key.split(".")[1]]
+        if key.endswith(".bytes") and value > limit: failures.append((key, limit, value))
+        if key.endswith(".peak_kb") and value > peak_limit: failures.append((key, peak_limit, value))
+        if key.endswith(".surfaces"):
+            allowed = results.get(key[:-len("surfaces")] + "text_misses", 0)
+            if value > allowed: failures.append((key, allowed, value))
+    return failures
+
+
+# --- 4. 汇总与比较 ---
+def run_timings(seconds, frames):
+    results = {}
+    for difficulty in DIFFICULTY_SETTINGS:
+        results[f"sim.{difficulty}.ticks_per_s"] = bench_sim(difficulty, seconds)
+    for name, ms in bench_themes(frames).items():
+        results[f"frame.{name}.ms"] = ms
+    results["frame.particles.ms"] = bench_particles(frames)
+    results["frame.LARGE.ms"] = time_frames(playing_game("LARGE"), frames)
+    results[f"frame.snake{LONG_SNAKE}.ms"] = bench_long_snake(frames)
+    return results
+
+
+def run(seconds, frames, repeats=REPEATS):
+    """计时项跑 repeats 遍取中位数，单次的抖动不会被当成退化；分配项每个难度只测一遍"""
+    runs = [run_timings(seconds, frames) for _ in range(repeats)]
+    results = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+    for difficulty in DIFFICULTY_SETTINGS: results.update(bench_allocations(ALLOC_STEPS, difficulty))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """返回退化项列表；*_per_s 越大越好，其余 (毫秒) 越小越好
+
+    alloc.* 不参与比较：净增字节接近 0 时相对容差没有意义，它们由 check_allocations 按各难度的绝对上限检查。
+    """
+    regressions = []
+    for key, base in baseline.items():
+        if key.startswith("alloc.") or key not in results or base <= 0: continue
+        value = results[key]
+        if key.endswith("_per_s"):
+            worse = value < base * (1 - tolerance)
+        else:
+            worse = value > base * (1 + tolerance)
+        if worse: regressions.append((key, base, value))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Snake performance benchmarks")
+    parser.add_argument("--seconds", type=float, default=2.0, help="seconds per simulation benchmark")
+    parser.add_argument("--frames", type=int, default=300, help="frames per rendering benchmark")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="runs of the timed benchmarks; the median is kept")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.seconds, args.frames, args.repeats)
+    pygame.quit()
+    for key, value in results.items(): print(f"{key:40s} {value:12.3f}")
+    with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+    mismatched = {difficulty: check_dirty_rects(difficulty) for difficulty in ("NORMAL", "LARGE")}
+    for difficulty, count in mismatched.items():
+        if count: print(f"DIRTY RECTS: {count} {difficulty} frames differ from a full repaint")
+    if any(mismatched.values()): return 1
+
+    try:
+        print(f"batch parity ok: {batch.check_parity(games=32, ticks=200)} board-steps compared")
+    except AssertionError as e:
+        print(f"BATCH PARITY MISMATCH: {e}")
+        return 1
+
+    failures = check_allocations(results)
+    if failures:
+        print("STEADY-STATE ALLOCATIONS:")
+        for key, limit, value in failures: print(f"  {key}: limit {limit} -> {value:.3f}")
+        return 1
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f: json.dump(results, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f: baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"PERFORMANCE REGRESSION (tolerance {args.tolerance:.0%}):")
+        for key, base, value in regressions: print(f"  {key}: baseline {base:.3f} -> {value:.3f}")
+        return 1
+    print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
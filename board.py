@@ -0,0 +1,355 @@
+import base64
+import sys
+from array import array
+
+# --- 1. 占用编号 ---
+# 0 为空格，1 为玩家，敌人从 2 开始 (第 i 条敌蛇为 i + 2)
+EMPTY = 0
+PLAYER = 1
+
+
+def enemy_owner(index):
+    return index + 2
+
+
+# 食物种类
+FOOD_NONE = 0
+FOOD_NORMAL = 1
+FOOD_GOLD = 2
+
+FOOD_BUCKET = 8  # 食物索引每个桶覆盖 8x8 格
+FOOD_SCAN_LIMIT = 16  # 食物不多于此数时直接逐个比较，比按桶扩展更快
+
+
+# --- 2. 空格索引 ---
+class FreeCells:
+    """空格集合：cells 数组 + 位置表，删除时与末尾交换，增删和均匀抽取都是 O(1)
+
+    抽取结果取决于 cells 的排列，快照需要按原顺序保存 (见 pack / unpack)。
+    两张表里存的整数都取自 ids，格子反复占用 / 释放时不会留下新建的 int 对象。
+    """
+
+    def __init__(self, size):
+        self.ids = tuple(range(size))
+        self.cells = list(self.ids)
+        self.index = list(self.ids)  # index[c] 为格子 c 在 cells 中的位置，-1 表示不空
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, c):
+        return self.index[c] >= 0
+
+    def add(self, c):
+        if self.index[c] >= 0: return
+        self.index[c] = self.ids[len(self.cells)]
+        self.cells.append(self.ids[c])
+
+    def discard(self, c):
+        i = self.index[c]
+        if i < 0: return
+        last = self.cells.pop()
+        if last != c:
+            self.cells[i] = last
+            self.index[last] = i
+        self.index[c] = -1
+
+    def choice(self, rng):
+        """均匀抽取一个空格；没有空格时立即返回 None"""
+        if not self.cells: return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+    def pack(self):
+        """cells 按顺序编码成小端 uint32 的 base64 字符串，可放进 JSON 快照"""
+        cells = array("I", self.cells)
+        if sys.byteorder == "big": cells.byteswap()
+        return base64.b64encode(cells.tobytes()).decode()
+
+    def unpack(self, data):
+        """按 pack 的结果恢复 cells 的顺序并重建位置表"""
+        cells = array("I", base64.b64decode(data))
+        if sys.byteorder == "big": cells.byteswap()
+        ids = self.ids
+        self.cells = [ids[c] for c in cells]
+        self.index = [-1] * len(ids)
+        for i, c in enumerate(self.cells): self.index[c] = ids[i]
+
+
+# --- 3. 占用格 ---
+class Board:
+    """整张棋盘共享的占用格 (格子 -> 蛇编号) 及空格索引
+
+    蛇每走一步只在新蛇头处 occupy、在旧蛇尾处 release，
+    因此所有碰撞和安全检查都是 O(1) 的查表。空格既没有蛇也没有食物，
+    食物放下时 reserve，被吃掉时格子已被蛇头占住，不需要再归还。
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.clear()
+
+    def clear(self):
+        self.owner = [EMPTY] * (self.width * self.height)
+        self.free = FreeCells(self.width * self.height)
+
+    def inside(self, pos):
+        return 0 <= pos[0] < self.width and 0 <= pos[1] < self.height
+
+    def owner_at(self, pos):
+        return self.owner[pos[1] * self.width + pos[0]]
+
+    def is_free(self, pos):
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height and self.owner[y * self.width + x] == EMPTY
+
+    def occupy(self, pos, owner):
+        c = pos[1] * self.width + pos[0]
+        self.owner[c] = owner
+        self.free.discard(c)
+
+    def release(self, pos):
+        c = pos[1] * self.width + pos[0]
+        self.owner[c] = EMPTY
+        self.free.add(c)
+
+    def release_all(self, cells):
+        for pos in cells: self.release(pos)
+
+    def reserve(self, pos):
+        """格子被食物占用，不再参与随机抽取"""
+        self.free.discard(pos[1] * self.width + pos[0])
+
+    def is_vacant(self, pos):
+        """既没有蛇也没有食物"""
+        return pos[1] * self.width + pos[0] in self.free
+
+    def random_free(self, rng):
+        c = self.free.choice(rng)
+        if c is None: return None
+        return c % self.width, c // self.width
+
+    def room(self, pos, limit):
+        """从 pos 出发最多数到 limit 个连通的空格 (pos 本身算一个)，用来判断会不会钻进死胡同"""
+        w, owner = self.width, self.owner
+        seen = {pos}
+        stack = [pos]
+        while stack and len(seen) < limit:
+            x, y = stack.pop()
+            for n in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if n not in seen and 0 <= n[0] < w and 0 <= n[1] < self.height and owner[n[1] * w + n[0]] == EMPTY:
+                    seen.add(n)
+                    stack.append(n)
+        return min(len(seen), limit)
+
+    def exits(self, pos):
+        """pos 周围没有蛇的格子数"""
+        x, y = pos
+        return self.is_free((x + 1, y)) + self.is_free((x - 1, y)) + self.is_free((x, y + 1)) + \
+            self.is_free((x, y - 1))
+
+
+# --- 4. 食物索引 ---
+class FoodIndex:
+    """全场共享的食物空间索引
+
+    kind 表负责 O(1) 的成员判断和删除，食物同时按 FOOD_BUCKET 大小的方块分桶
+    (桶清空后保留，食物反复出现在同一片区域时不再新建集合)，
+    最近食物查询从所在的桶向外一圈圈扩展，找到的距离不可能被更外圈超过时即停止。
+    normal / golden 两个集合可直接遍历用于绘制。
+    """
+
+    def __init__(self, width, height, bucket=FOOD_BUCKET):
+        self.width = width
+        self.height = height
+        self.bucket = bucket
+        self.kind = {}
+        self.normal = set()
+        self.golden = set()
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __contains__(self, pos):
+        return pos in self.kind
+
+    def kind_at(self, pos):
+        return self.kind.get(pos, FOOD_NONE)
+
+    def add(self, pos, kind):
+        self.kind[pos] = kind
+        (self.golden if kind == FOOD_GOLD else self.normal).add(pos)
+        key = (pos[0] // self.bucket, pos[1] // self.bucket)
+        cell = self.buckets.get(key)
+        if cell is None: cell = self.buckets[key] = set()
+        cell.add(pos)
+
+    def remove(self, pos):
+        """删除并返回该格的食物种类，没有食物时返回 FOOD_NONE"""
+        kind = self.kind.pop(pos, FOOD_NONE)
+        if kind == FOOD_NONE: return kind
+        (self.golden if kind == FOOD_GOLD else self.normal).discard(pos)
+        key = (pos[0] // self.bucket, pos[1] // self.bucket)
+        self.buckets[key].discard(pos)
+        return kind
+
+    def nearest(self, pos):
+        """曼哈顿距离最近的食物，距离相同时取 (y, x) 较小者；没有食物时返回 None"""
+        if not self.kind: return None
+        x, y = pos
+        if len(self.kind) <= FOOD_SCAN_LIMIT:
+            return min(self.kind, key=lambda f: (abs(f[0] - x) + abs(f[1] - y), f[1], f[0]))
+        bx, by = x // self.bucket, y // self.bucket
+        max_ring = max(bx, by, (self.width - 1) // self.bucket - bx, (self.height - 1) // self.bucket - by)
+        best, best_key = None, None
+        for ring in range(max_ring + 1):
+            for key in self.ring_keys(bx, by, ring):
+                cell = self.buckets.get(key)
+                if not cell: continue
+                for f in cell:
+                    k = (abs(f[0] - x) + abs(f[1] - y), f[1], f[0])
+                    if best_key is None or k < best_key: best, best_key = f, k
+            # 第 ring + 1 圈里的格子离 pos 至少 ring * bucket + 1 步
+            if best_key is not None and best_key[0] <= ring * self.bucket: break
+        return best
+
+    def in_rect(self, x0, y0, x1, y1):
+        """x0 <= x < x1、y0 <= y < y1 范围内的食物 (位置, 种类)，只遍历与范围相交的桶"""
+        b = self.bucket
+        for kx in range(x0 // b, (x1 - 1) // b + 1):
+            for ky in range(y0 // b, (y1 - 1) // b + 1):
+                for pos in self.buckets.get((kx, ky), ()):
+                    if x0 <= pos[0] < x1 and y0 <= pos[1] < y1: yield pos, self.kind[pos]
+
+    def ring_keys(self, bx, by, ring):
+        if ring == 0:
+            yield bx, by
+            return
+        for kx in range(bx - ring, bx + ring + 1):
+            yield kx, by - ring
+            yield kx, by + ring
+        for ky in range(by - ring + 1, by + ring):
+            yield bx - ring, ky
+            yield bx + ring, ky
+
+
+# --- 5. 距离场 ---
+class FlowField:
+    """从全部食物出发的多源 BFS 距离场，每步算一次，所有敌人共用
+
+    蛇身是障碍，食物格本身距离为 0。传入敌人蛇头时按层扩展，
+    一旦每个蛇头都有邻格被标注就在该层结束后停止，敌人要的最小值已经确定，
+    更远的格子视为不可达。标注用代数戳区分，重算时无需清空数组。
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.dist = [0] * size
+        self.seen = [0] * size
+        self.gen = 0
+        self.frontier = []  # BFS 当前层和下一层，两个列表轮流复用
+        self.next = []
+        self.neighbors = []
+        for c in range(size):
+            x, y = c % width, c // width
+            self.neighbors.append([nx + ny * width for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y))
+                                   if 0 <= nx < width and 0 <= ny < height])
+
+    def compute(self, board, sources, heads=()):
+        self.gen += 1
+        gen, seen, dist, owner, neighbors, w = self.gen, self.seen, self.dist, board.owner, self.neighbors, self.width
+
+        # watch: 蛇头邻格 -> 在等这个格子的蛇头编号
+        watch = {}
+        for i, (x, y) in enumerate(heads):
+            for c in neighbors[x + y * w]: watch.setdefault(c, []).append(i)
+        waiting = set(range(len(heads)))
+
+        frontier, nxt = self.frontier, self.next
+        frontier.clear()
+        for x, y in sources:
+            c = x + y * w
+            seen[c] = gen
+            dist[c] = 0
+            frontier.append(c)
+            if c in watch: waiting.difference_update(watch[c])
+
+        d = 0
+        while frontier and (waiting or not heads):
+            d += 1
+            nxt.clear()
+            for c in frontier:
+                for n in neighbors[c]:
+                    if seen[n] != gen and owner[n] == EMPTY:
+                        seen[n] = gen
+                        dist[n] = d
+                        nxt.append(n)
+                        if n in watch: waiting.difference_update(watch[n])
+            frontier, nxt = nxt, frontier
+
+    def distance(self, pos):
+        """到最近食物的步数，不可达或未展开到时返回 None"""
+        c = pos[0] + pos[1] * self.width
+        return self.dist[c] if self.seen[c] == self.gen else None
+
+
+# --- 6. 环形缓冲蛇身 ---
+class SnakeBody:
+    """环形缓冲实现的蛇身，下标 0 为蛇头
+
+    push_head / pop_tail 都是 O(1)。上一步去掉的蛇尾仍留在缓冲区里，
+    所以 prev(i) 可以直接给出第 i 节在上一步的位置，插值绘制时无需复制整条蛇。
+    """
+
+    def __init__(self, cells):
+        self.buf = [None] * max(8, len(cells) * 2)
+        self.start = 0
+        self.length = 0
+        for pos in reversed(cells): self.push_head(pos)
+        self.hold()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0: i += self.length
+        if not 0 <= i < self.length: raise IndexError(i)
+        return self.buf[(self.start + i) % len(self.buf)]
+
+    def __iter__(self):
+        buf, cap = self.buf, len(self.buf)
+        for i in range(self.length): yield buf[(self.start + i) % cap]
+
+    def push_head(self, pos):
+        # 至少留一个空槽给刚去掉的蛇尾，保证 prev() 可用
+        if self.length + 2 > len(self.buf): self.grow()
+        self.start = (self.start - 1) % len(self.buf)
+        self.buf[self.start] = pos
+        self.length += 1
+        self.moved = True
+        self.grew = True
+
+    def pop_tail(self):
+        self.length -= 1
+        self.grew = False
+        return self.buf[(self.start + self.length) % len(self.buf)]
+
+    def grow(self):
+        cells = list(self)
+        self.buf = cells + [None] * len(cells)
+        self.start = 0
+
+    def hold(self):
+        """本步没有移动：插值起点就是当前位置"""
+        self.moved = False
+        self.grew = False
+
+    def prev(self, i):
+        """第 i 节在上一步的位置"""
+        if not self.moved: return self[i]
+        if i + 1 < self.length: return self[i + 1]
+        if self.grew: return self[i]
+        return self.buf[(self.start + self.length) % len(self.buf)]
@@ -1,9 +1,15 @@
+import time
+
+STARTUP_T0 = time.perf_counter()  # 启动计时起点，"import" 阶段从这里算起
+
 import asyncio
 import pygame
 import random
 import os
+import sys
 import json
 import math
+from collections import deque
 
 # --- 1. 基础配置 ---
 CELL_SIZE = 40
@@ -11,7 +17,11 @@ GRID_WIDTH = 30
 GRID_HEIGHT = 20
 WINDOW_WIDTH = GRID_WIDTH * CELL_SIZE
 WINDOW_HEIGHT = GRID_HEIGHT * CELL_SIZE + 60
-FPS = 60
+FPS = 60  # 浏览器里由显示器刷新节奏驱动，只在本地直接运行时用它限速
+TICK_RATE = 60  # 模拟固定每秒 60 次，与刷新率无关
+TICK_MS = 1000 / TICK_RATE
+MAX_TICKS_PER_FRAME = 10  # 落后太多时一帧最多补 10 个 tick，其余丢弃
+IN_BROWSER = sys.platform == "emscripten"
 
 # --- 2. 主题配色配置 ---
 THEMES = [
@@ -76,6 +86,9 @@ RIGHT = (1, 0)
 DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
 
 DATA_FILE = "snake_data_v8.json"
+# 随网页包一起发布的字体文件；不存在时用 pygame 自带字体。两种情况都不枚举系统字体
+BUNDLED_FONT = "font.ttf"
+FONT_SPECS = {"font": (24, False), "big_font": (56, True), "cartoon_font": (40, True)}  # 名称: (字号, 是否粗体)
 
 DIFFICULTY_SETTINGS = {
     "EASY": {"speed": 200, "enemies": 1, "label": "EASY"},
@@ -223,26 +236,86 @@ class EnemySnake:
                                  border_radius=8)
 
 
-# --- 5. 游戏主类 ---
+# --- 5. 帧调度 ---
+class FrameScheduler:
+    """asyncio 版的帧调度
+
+    每次 begin() 按真实经过的时间算出这一帧要补跑几个固定 tick，余下的留在 accumulator 里用于插值。
+    浏览器里 wait() 只让出一次，由页面按显示器刷新节奏 (requestAnimationFrame) 唤醒；
+    本地运行时睡到下一帧。刷新间隔取最近帧间隔的中位数，间隔明显超过它时把漏掉的帧记为丢帧。
+    """
+
+    def __init__(self, tick_ms=TICK_MS, max_ticks=MAX_TICKS_PER_FRAME, window=120):
+        self.tick_ms = tick_ms
+        self.max_ticks = max_ticks
+        self.intervals = deque([1000 / FPS], maxlen=window)
+        self.refresh_ms = 1000 / FPS
+        self.last = time.perf_counter()
+        self.accumulator = 0.0
+        self.frames = 0
+        self.rendered = 0
+        self.skipped = 0  # 画面没有变化、跳过绘制的帧
+        self.dropped = 0  # 按刷新间隔推算漏掉的帧
+        self.lost_ticks = 0  # 超过 max_ticks 被丢弃的 tick
+        self.most_ticks = 0  # 单帧补跑 tick 数的最大值
+
+    def begin(self):
+        """开始新的一帧，返回这一帧要运行的 tick 数"""
+        now = time.perf_counter()
+        elapsed = (now - self.last) * 1000
+        self.last = now
+        self.frames += 1
+        self.intervals.append(elapsed)
+        if self.frames % 30 == 0: self.refresh_ms = sorted(self.intervals)[len(self.intervals) // 2]
+        if elapsed > self.refresh_ms * 1.5: self.dropped += round(elapsed / self.refresh_ms) - 1
+
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.tick_ms)
+        if ticks > self.max_ticks:
+            self.lost_ticks += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_ms
+        self.most_ticks = max(self.most_ticks, ticks)
+        return ticks
+
+    def reset(self):
+        """长时间停在等待界面后重新开始计时，不补跑这段时间"""
+        self.last = time.perf_counter()
+        self.accumulator = 0.0
+
+    async def wait(self):
+        if IN_BROWSER:
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(max(0.0, 1 / FPS - (time.perf_counter() - self.last)))
+
+    def report(self):
+        return (f"frames {self.frames} | rendered {self.rendered} | skipped {self.skipped} | "
+                f"dropped {self.dropped} | refresh {self.refresh_ms:.1f} ms | "
+                f"max ticks/frame {self.most_ticks} | lost ticks {self.lost_ticks}")
+
+
+# --- 6. 游戏主类 ---
 class Game:
     def __init__(self):
+        # 启动各阶段耗时，第一帧画完后打印到控制台
+        self.startup_phases = {}
+        self.startup_last = STARTUP_T0
+        self.font_ms = 0.0
+        self.mark_startup("import")
+
         pygame.init()
         pygame.display.set_caption("Snake V8.0 Web Edition")
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.clock = pygame.time.Clock()
+        self.mark_startup("display")
 
         # --- 字体设置 ---
-        font_names = ['simhei', 'microsoftyahei', 'stheitirelight', 'arialunicode']
-        target_font = None
-        available_fonts = pygame.font.get_fonts()
-        for f in font_names:
-            if f in available_fonts:
-                target_font = f
-                break
-
-        self.font = pygame.font.SysFont(target_font, 24)
-        self.big_font = pygame.font.SysFont(target_font, 56, bold=True)
-        self.cartoon_font = pygame.font.SysFont(target_font, 40, bold=True)
+        # 浏览器里枚举系统字体很慢，这里只用随包字体，并且第一次用到时才打开
+        self.font_path = BUNDLED_FONT if os.path.exists(BUNDLED_FONT) else None
+        self.fonts = {}
+        self.mark_startup("fonts")
 
         # UI 初始化
         btn_w, btn_h = 340, 50
@@ -260,6 +333,11 @@ class Game:
 
         self.state = "MENU"
         self.stats = self.load_data()
+        self.mark_startup("data")
+        self.scheduler = FrameScheduler()
+        self.sim_time = 0  # 已模拟的毫秒数，所有游戏内计时都以它为准
+        self.needs_redraw = True  # 非游戏画面只在有输入或状态变化时重画
+        self.show_stats = False  # F3 显示帧调度统计
         self.current_difficulty = DIFFICULTY_SETTINGS["NORMAL"]
         self.theme_index = 0
 
@@ -268,6 +346,37 @@ class Game:
 
         self.reset_game()
 
+    def mark_startup(self, name):
+        """记下距上一个标记的毫秒数；其间懒加载字体的耗时另记到 fonts 阶段"""
+        now = time.perf_counter()
+        phases = self.startup_phases
+        phases[name] = phases.get(name, 0.0) + (now - self.startup_last) * 1000 - self.font_ms
+        if self.font_ms: phases["fonts"] = phases.get("fonts", 0.0) + self.font_ms
+        self.startup_last = now
+        self.font_ms = 0.0
+
+    def get_font(self, name):
+        font = self.fonts.get(name)
+        if font is None:
+            start = time.perf_counter()
+            size, bold = FONT_SPECS[name]
+            font = self.fonts[name] = pygame.font.Font(self.font_path, size)
+            if bold: font.set_bold(True)
+            self.font_ms += (time.perf_counter() - start) * 1000
+        return font
+
+    @property
+    def font(self):
+        return self.get_font("font")
+
+    @property
+    def big_font(self):
+        return self.get_font("big_font")
+
+    @property
+    def cartoon_font(self):
+        return self.get_font("cartoon_font")
+
     def init_theme_rects(self):
         card_w, card_h = 240, 160
         gap_x, gap_y = 30, 30
@@ -317,7 +426,7 @@ class Game:
         self.score = 0
         self.base_speed = self.current_difficulty["speed"]
         self.move_delay = self.base_speed
-        self.last_move_time = pygame.time.get_ticks()
+        self.last_move_time = self.sim_time
         self.is_boosting = False
 
         self.foods = []
@@ -349,8 +458,11 @@ class Game:
         events = pygame.event.get()
         mouse_pos = pygame.mouse.get_pos()
 
+        if events: self.needs_redraw = True
         for event in events:
             if event.type == pygame.QUIT: return False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_stats = not self.show_stats
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
 
                 if self.state == "MENU":
@@ -406,7 +518,9 @@ class Game:
 
     def update(self):
         if self.state != "PLAYING": return
-        current_time = pygame.time.get_ticks()
+        self.sim_time += TICK_MS
+        current_time = self.sim_time
+        if self.flash_effect > 0: self.flash_effect -= 1
         if random.random() < 0.005: self.add_golden_food()
 
         if current_time - self.last_move_time > self.move_delay:
@@ -481,6 +595,7 @@ class Game:
         self.draw()
         pygame.display.flip()
         self.state = "GAMEOVER"
+        self.needs_redraw = True
         self.stats["games_played"] += 1
         if self.score > self.stats["high_score"]: self.stats["high_score"] = self.score
         self.save_data()
@@ -624,8 +739,8 @@ class Game:
                              (gx * CELL_SIZE + 2 - glow, gy * CELL_SIZE + 2 + offset_y - glow, CELL_SIZE - 4 + glow * 2,
                               CELL_SIZE - 4 + glow * 2), border_radius=12)
 
-        curr_time = pygame.time.get_ticks()
-        alpha = min((curr_time - self.last_move_time) / self.move_delay, 1.0)
+        # 插值比例：上次移动后已过的模拟时间，加上还没凑够一个 tick 的部分
+        alpha = min((self.sim_time + self.scheduler.accumulator - self.last_move_time) / self.move_delay, 1.0)
 
         for enemy in self.enemies: enemy.draw(self.screen, offset_y, alpha)
 
@@ -664,7 +779,6 @@ class Game:
             s.set_alpha(100)
             s.fill((255, 255, 255))
             self.screen.blit(s, (0, 0))
-            self.flash_effect -= 1
 
         if self.state == "PAUSED":
             overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
@@ -687,31 +801,50 @@ class Game:
             self.draw_button(self.btn_restart, "Play Again", mouse_pos)
             self.draw_button(self.btn_menu, "Main Menu", mouse_pos)
 
+    def draw_frame_stats(self):
+        txt = self.font.render(self.scheduler.report(), True, (0, 255, 0))
+        bg = pygame.Rect(0, WINDOW_HEIGHT - txt.get_height() - 10, txt.get_width() + 20, txt.get_height() + 10)
+        pygame.draw.rect(self.screen, (0, 0, 0), bg)
+        self.screen.blit(txt, (bg.x + 10, bg.y + 5))
+
     async def run(self):
+        scheduler = self.scheduler
+        # 提示画面只画一次，之后每帧只检查事件，直到点击或按键
+        self.screen.fill((20, 20, 30))
+        msg = self.font.render("Click Anywhere to Start Game", True, (255, 255, 255))
+        self.screen.blit(msg, msg.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+        pygame.display.flip()
+        self.mark_startup("first_frame")
+        total = sum(self.startup_phases.values())
+        print(f"startup {total:.1f} ms: " + " | ".join(f"{name} {ms:.1f}" for name, ms in self.startup_phases.items()))
+
         waiting_for_click = True
         while waiting_for_click:
-            self.screen.fill((20, 20, 30))
-            msg = self.font.render("Click Anywhere to Start Game", True, (255, 255, 255))
-            self.screen.blit(msg, msg.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
-            pygame.display.flip()
-
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     return
                 if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN:
                     waiting_for_click = False
+            await scheduler.wait()
 
-            await asyncio.sleep(0.05)
-
+        scheduler.reset()
         running = True
         while running:
+            ticks = scheduler.begin()
             running = self.handle_input()
-            self.update()
-            self.draw()
-            pygame.display.flip()
-            await asyncio.sleep(0)
-            self.clock.tick(FPS)
+            for _ in range(ticks): self.update()
+            # 游戏进行中插值每帧都在变；其他画面没有输入和状态变化时不重画
+            if self.state == "PLAYING" or self.needs_redraw:
+                self.draw()
+                if self.show_stats: self.draw_frame_stats()
+                pygame.display.flip()
+                scheduler.rendered += 1
+                self.needs_redraw = False
+            else:
+                scheduler.skipped += 1
+            await scheduler.wait()
 
+        print(scheduler.report())
         pygame.quit()
 
 
@@ -0,0 +1,374 @@
+import base64
+import random
+import struct
+
+from board import Board, SnakeBody, FoodIndex, FlowField, EMPTY, PLAYER, FOOD_NORMAL, FOOD_GOLD, enemy_owner
+
+# --- 1. 规则配置 ---
+GRID_WIDTH = 30
+GRID_HEIGHT = 20
+
+# 方向向量
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+
+# 难度配置 (width / height / food 可选，缺省为 GRID_WIDTH / GRID_HEIGHT / FOOD_COUNT)
+DIFFICULTY_SETTINGS = {
+    "EASY": {"speed": 200, "enemies": 1, "label": "EASY"},
+    "NORMAL": {"speed": 130, "enemies": 3, "label": "NORMAL"},
+    "HARD": {"speed": 90, "enemies": 6, "label": "HARD"},
+    "LARGE": {"speed": 130, "enemies": 12, "label": "LARGE", "width": 100, "height": 100, "food": 40},
+    "ARENA": {"speed": 130, "enemies": 400, "label": "ARENA", "width": 250, "height": 250, "food": 800}
+}
+
+FOOD_COUNT = 5
+GOLDEN_FOOD_MAX = 3
+GOLDEN_FOOD_CHANCE = 0.005  # 每 1/60 秒出现金色食物的概率
+GOLDEN_FOOD_FRAME_MS = 1000 / 60
+COMBO_WINDOW = 5000  # 连击判定窗口 (毫秒, 按模拟时间计)
+RESPAWN_TRIES = 32  # 敌人出生点随机抽取的次数，失败后再扫描全部空格
+ROOM_LIMIT = 32  # 敌人判断死胡同时最多数的空格数
+ENEMY_THINK_BUDGET = 64  # 每步最多重新规划的敌人数，敌人更多时分批轮流规划，其余沿原方向前进
+FLOW_FIELD_MAX_CELLS = 100 * 100  # 超过这个格数的棋盘不再每步做整场 BFS，改用分桶的最近食物
+
+
+def boost_delay(base_speed):
+    """加速状态下的移动间隔"""
+    return max(50, int(base_speed * 0.5))
+
+
+# --- 2. 敌方AI ---
+class EnemySnake:
+    def __init__(self, engine, index, spawn=True):
+        self.engine = engine
+        self.owner = enemy_owner(index)
+        self.alive = False
+        self.body = []
+        self.direction = LEFT
+        if spawn: self.respawn()
+
+    def respawn(self):
+        """在 x >= 10 处找三个连续空格横向出生、朝左；找不到位置时返回 False 并保持死亡"""
+        engine = self.engine
+        board = engine.board
+        if self.alive: self.die()
+
+        head = None
+        for _ in range(RESPAWN_TRIES):
+            pos = board.random_free(engine.rng)
+            if pos is None: return False
+            if self.can_spawn_at(pos):
+                head = pos
+                break
+        if head is None:
+            spots = [(c % engine.width, c // engine.width) for c in board.free.cells]
+            spots = [pos for pos in spots if self.can_spawn_at(pos)]
+            if not spots: return False
+            head = engine.rng.choice(spots)
+
+        x, y = head
+        self.body = SnakeBody([(x, y), (x + 1, y), (x + 2, y)])
+        self.direction = LEFT
+        for pos in self.body: board.occupy(pos, self.owner)
+        self.alive = True
+        return True
+
+    def can_spawn_at(self, pos):
+        x, y = pos
+        if x < 10 or x > self.engine.width - 3: return False
+        board = self.engine.board
+        return board.is_vacant((x, y)) and board.is_vacant((x + 1, y)) and board.is_vacant((x + 2, y))
+
+    def die(self):
+        self.alive = False
+        self.engine.board.release_all(self.body)
+
+    def move(self, think=True):
+        """读取本步的共享距离场选路：先避开装不下自己的死胡同，再取离食物最近的安全方向
+
+        距离和出口数都相同时按 DIRECTIONS 的顺序取，选路本身不消耗随机数 (batch 模块可逐步对拍)。
+        think 为 False 时 (本步不轮到它规划) 前方是空格就直接前进，被挡住才重新规划。
+        """
+        if not self.alive: return
+        engine = self.engine
+        head = self.body[0]
+        if not think:
+            ahead = (head[0] + self.direction[0], head[1] + self.direction[1])
+            if self.is_safe(ahead):
+                self.advance(ahead)
+                return
+        target = None
+
+        candidates = engine.candidates
+        candidates.clear()
+        for i, move_dir in enumerate(DIRECTIONS):
+            if (move_dir[0] + self.direction[0] == 0) and (move_dir[1] + self.direction[1] == 0): continue
+            new_head = (head[0] + move_dir[0], head[1] + move_dir[1])
+            if not self.is_safe(new_head): continue
+            d = engine.field.distance(new_head) if engine.use_field else None
+            if d is None:
+                # 距离场没覆盖到时退回朝最近食物 (场上没有食物时朝棋盘中心) 的曼哈顿距离
+                if target is None:
+                    target = engine.food.nearest(head) or (engine.width // 2, engine.height // 2)
+                d = engine.width * engine.height + abs(new_head[0] - target[0]) + abs(new_head[1] - target[1])
+            candidates.append((d, -engine.board.exits(new_head), i, move_dir, new_head))
+
+        if not candidates:
+            self.die()
+            engine.events.append({"type": "enemy_trapped", "pos": head})
+            return
+
+        # 按距离从近到远检查，第一个装得下自己的方向即为所选；都装不下时选空间最大的
+        candidates.sort()
+        need = min(len(self.body), ROOM_LIMIT)
+        best, best_room = None, -1
+        for c in candidates:
+            room = engine.board.room(c[4], need)
+            if room > best_room: best, best_room = c[3], room
+            if room >= need: break
+
+        self.direction = best
+        self.advance((head[0] + best[0], head[1] + best[1]))
+
+    def advance(self, new_head):
+        engine = self.engine
+        self.body.push_head(new_head)
+        engine.board.occupy(new_head, self.owner)
+
+        kind = engine.food.remove(new_head)
+        if kind == FOOD_NORMAL:
+            engine.add_food()
+        elif kind != FOOD_GOLD:
+            engine.board.release(self.body.pop_tail())
+
+    def is_safe(self, pos):
+        return self.engine.board.is_free(pos)
+
+
+# --- 3. 规则核心 ---
+class Engine:
+    """无界面的规则核心：不依赖 pygame 和真实时钟，一次 step 即一次移动"""
+
+    def __init__(self, difficulty="NORMAL", width=None, height=None, seed=None):
+        # 显式给出的 width / height 对所有难度生效，否则按难度配置决定棋盘大小
+        self.fixed_size = (width, height)
+        self.width = self.height = None
+        self.field = None
+        # 每步复用的临时列表：传给距离场的敌人蛇头、敌人规划时的候选方向
+        self.heads = []
+        self.candidates = []
+        # seeds 只用来给每一局派发种子，局内的随机数全部来自 rng，同一种子的一局可以完整重现
+        self.seeds = random.Random(seed)
+        self.golden_chance = GOLDEN_FOOD_CHANCE
+        self.reset(difficulty)
+
+    def reset(self, difficulty=None, seed=None):
+        """开始新的一局；seed 为 None 时从 seeds 中取下一个种子"""
+        if difficulty is not None:
+            self.difficulty = difficulty
+            self.settings = DIFFICULTY_SETTINGS[difficulty]
+        self.seed = self.seeds.getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.resize(*self.board_size(self.settings))
+
+        self.board = Board(self.width, self.height)
+        sx, sy = 4, self.height // 2
+        self.snake = SnakeBody([(sx, sy), (sx - 1, sy), (sx - 2, sy)])
+        for pos in self.snake: self.board.occupy(pos, PLAYER)
+        self.direction = RIGHT
+        self.alive = True
+
+        self.score = 0
+        self.base_speed = self.settings["speed"]
+        self.move_delay = self.base_speed
+        self.is_boosting = False
+
+        # 模拟时间：每次 step 推进一个移动间隔，与帧率和真实时钟无关
+        self.ticks = 0
+        self.time_ms = 0
+        self.events = []
+
+        # foods / golden_foods 是索引内部集合的只读别名，供绘制和统计遍历
+        self.food = FoodIndex(self.width, self.height)
+        self.foods = self.food.normal
+        self.golden_foods = self.food.golden
+        for _ in range(self.settings.get("food", FOOD_COUNT)): self.add_food()
+
+        self.enemies = []
+        for i in range(self.settings["enemies"]):
+            self.enemies.append(EnemySnake(self, i))
+        self.think_every = max(1, -(-len(self.enemies) // ENEMY_THINK_BUDGET))
+
+        self.combo_count = 0
+        self.last_gold_time = -COMBO_WINDOW
+
+    def board_size(self, settings):
+        width, height = self.fixed_size
+        return width or settings.get("width", GRID_WIDTH), height or settings.get("height", GRID_HEIGHT)
+
+    def resize(self, width, height):
+        """棋盘大小变化时重建距离场 (邻接表与棋盘大小相关)；大棋盘不用距离场"""
+        self.use_field = width * height <= FLOW_FIELD_MAX_CELLS
+        if (width, height) == (self.width, self.height): return
+        self.width = width
+        self.height = height
+        self.field = FlowField(width, height) if self.use_field else None
+
+    def get_random_pos(self):
+        """均匀抽取一个既没有蛇也没有食物的格子，棋盘已满时返回 None"""
+        return self.board.random_free(self.rng)
+
+    def add_food(self):
+        pos = self.get_random_pos()
+        if pos is None: return None
+        self.board.reserve(pos)
+        self.food.add(pos, FOOD_NORMAL)
+        return pos
+
+    def add_golden_food(self):
+        if len(self.golden_foods) >= GOLDEN_FOOD_MAX: return None
+        pos = self.get_random_pos()
+        if pos is None: return None
+        self.board.reserve(pos)
+        self.food.add(pos, FOOD_GOLD)
+        return pos
+
+    def set_boost(self, boosting):
+        self.is_boosting = boosting
+        self.move_delay = boost_delay(self.base_speed) if boosting else self.base_speed
+
+    def step(self, direction=None, boost=None):
+        """推进一次移动，返回本次产生的事件列表"""
+        self.events = []
+        if not self.alive: return self.events
+        if boost is not None: self.set_boost(boost)
+        if direction is not None and (direction[0] + self.direction[0] != 0 or direction[1] + self.direction[1] != 0):
+            self.direction = direction
+
+        self.ticks += 1
+        self.time_ms += self.move_delay
+
+        # 金色食物按模拟时间折算概率，保持与原先每帧 0.5% 相同的出现速率
+        frames = self.move_delay / GOLDEN_FOOD_FRAME_MS
+        if self.rng.random() < 1 - (1 - self.golden_chance) ** frames: self.add_golden_food()
+
+        head_x, head_y = self.snake[0]
+        dx, dy = self.direction
+        new_head = (head_x + dx, head_y + dy)
+
+        if not self.board.inside(new_head):
+            return self.die("wall")
+        owner = self.board.owner_at(new_head)
+        if owner == PLAYER:
+            return self.die("self")
+        if owner != EMPTY:
+            return self.die("enemy")
+
+        self.snake.push_head(new_head)
+        self.board.occupy(new_head, PLAYER)
+        should_shrink = False
+        kind = self.food.remove(new_head)
+
+        if kind == FOOD_NORMAL:
+            self.score += 10
+            self.add_food()
+            self.events.append({"type": "food", "pos": new_head})
+
+        elif kind == FOOD_GOLD:
+            self.score += 50
+            if self.time_ms - self.last_gold_time < COMBO_WINDOW:
+                self.combo_count += 1
+            else:
+                self.combo_count = 1
+            self.last_gold_time = self.time_ms
+            self.events.append({"type": "golden", "pos": new_head, "combo": self.combo_count})
+        else:
+            should_shrink = True
+
+        if should_shrink: self.board.release(self.snake.pop_tail())
+
+        # 距离场按玩家移动后的局面每步算一次，敌人依次读取；
+        # 敌人只会走进空格，不会撞进玩家身体，因此无需再做敌人撞玩家的检查
+        # 敌人太多时分批：第 i 条只在 (i + ticks) % think_every == 0 的步重新规划
+        if self.use_field:
+            heads = self.heads
+            heads.clear()
+            for enemy in self.enemies:
+                if enemy.alive: heads.append(enemy.body[0])
+            if heads: self.field.compute(self.board, self.food.kind, heads)
+        for i, enemy in enumerate(self.enemies):
+            enemy.move((i + self.ticks) % self.think_every == 0)
+
+        return self.events
+
+    def die(self, cause):
+        self.alive = False
+        self.snake.hold()
+        self.events.append({"type": "death", "cause": cause})
+        return self.events
+
+    # --- 快照 ---
+    def snapshot(self):
+        """可 JSON 序列化的完整局面
+
+        包含随机数状态和空格索引的顺序 (随机抽格依赖它，两者都存为小端 uint32 的 base64)，
+        restore 之后继续 step 与原局逐步一致。
+        """
+        version, state, gauss = self.rng.getstate()
+        state = base64.b64encode(struct.pack(f"<{len(state)}I", *state)).decode()
+        return {
+            "difficulty": self.difficulty, "seed": self.seed, "rng": [version, state, gauss],
+            "direction": self.direction, "alive": self.alive, "score": self.score,
+            "is_boosting": self.is_boosting, "ticks": self.ticks, "time_ms": self.time_ms,
+            "combo_count": self.combo_count, "last_gold_time": self.last_gold_time,
+            "snake": list(self.snake), "foods": sorted(self.foods), "golden": sorted(self.golden_foods),
+            "enemies": [{"alive": e.alive, "direction": e.direction, "body": list(e.body)} for e in self.enemies],
+            "free": self.board.free.pack(),
+        }
+
+    def restore(self, snap):
+        self.difficulty = snap["difficulty"]
+        self.settings = DIFFICULTY_SETTINGS[self.difficulty]
+        self.resize(*self.board_size(self.settings))
+        self.seed = snap["seed"]
+        version, state, gauss = snap["rng"]
+        state = base64.b64decode(state)
+        self.rng = random.Random()
+        self.rng.setstate((version, struct.unpack(f"<{len(state) // 4}I", state), gauss))
+
+        self.board = Board(self.width, self.height)
+        self.snake = SnakeBody([tuple(p) for p in snap["snake"]])
+        for pos in self.snake: self.board.occupy(pos, PLAYER)
+        self.direction = tuple(snap["direction"])
+        self.alive = snap["alive"]
+        self.score = snap["score"]
+        self.base_speed = self.settings["speed"]
+        self.set_boost(snap["is_boosting"])
+        self.ticks = snap["ticks"]
+        self.time_ms = snap["time_ms"]
+        self.events = []
+        self.combo_count = snap["combo_count"]
+        self.last_gold_time = snap["last_gold_time"]
+
+        self.food = FoodIndex(self.width, self.height)
+        self.foods = self.food.normal
+        self.golden_foods = self.food.golden
+        for pos in snap["foods"]: self.food.add(tuple(pos), FOOD_NORMAL)
+        for pos in snap["golden"]: self.food.add(tuple(pos), FOOD_GOLD)
+
+        self.enemies = []
+        self.think_every = max(1, -(-len(snap["enemies"]) // ENEMY_THINK_BUDGET))
+        for i, e in enumerate(snap["enemies"]):
+            enemy = EnemySnake(self, i, spawn=False)
+            enemy.body = SnakeBody([tuple(p) for p in e["body"]])
+            enemy.direction = tuple(e["direction"])
+            enemy.alive = e["alive"]
+            if enemy.alive:
+                for pos in enemy.body: self.board.occupy(pos, enemy.owner)
+            self.enemies.append(enemy)
+
+        # 空格索引按快照里的顺序重建
+        self.board.free.unpack(snap["free"])
@@ -0,0 +1,193 @@
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from board import PLAYER
+from engine import Engine, GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, DIFFICULTY_SETTINGS
+
+# --- 1. 编码约定 ---
+# 动作编号与 engine.DIRECTIONS 顺序一致: 0=UP 1=DOWN 2=LEFT 3=RIGHT (同 batch 模块)；掉头的动作被忽略，保持原方向
+N_ACTIONS = len(DIRECTIONS)
+
+# 观测为 (通道, 高, 宽) 的 uint8 张量，格子里有对应物体为 1；自己的蛇头同时也在 CH_BODY 里
+CH_HEAD = 0
+CH_BODY = 1
+CH_ENEMY = 2
+CH_FOOD = 3
+CH_GOLD = 4
+N_CHANNELS = 5
+
+REWARD_PER_POINT = 0.1  # 得分折算成奖励：普通食物 +1，金色食物 +5
+DEATH_REWARD = -1.0
+MAX_STEPS = 10000  # 单局步数上限，到达时 truncated
+
+
+def observation_shape(difficulty):
+    settings = DIFFICULTY_SETTINGS[difficulty]
+    return N_CHANNELS, settings.get("height", GRID_HEIGHT), settings.get("width", GRID_WIDTH)
+
+
+# --- 2. 单个环境 ---
+class SnakeEnv:
+    """gym 风格的 reset() / step(action) 包装，不依赖 pygame
+
+    玩家蛇由动作控制，敌人仍由 EnemySnake 的 AI 驾驶，一次 step 即游戏里的一次移动。
+    step 返回 (观测, 奖励, terminated, truncated, info)。观测每次写回同一个数组 (可由 out 指定)，
+    需要保留时请自行复制。
+    """
+
+    def __init__(self, difficulty="NORMAL", seed=None, max_steps=MAX_STEPS, out=None):
+        self.engine = Engine(difficulty, seed=seed)
+        self.max_steps = max_steps
+        self.shape = (N_CHANNELS, self.engine.height, self.engine.width)
+        self.obs = np.zeros(self.shape, np.uint8) if out is None else out
+
+    def reset(self, seed=None):
+        """开始新的一局，返回 (观测, info)；seed 为 None 时沿用构造时种子派生的下一个种子"""
+        self.engine.reset(seed=seed)
+        return self.observe(), self.info()
+
+    def step(self, action):
+        engine = self.engine
+        score = engine.score
+        cause = None
+        for event in engine.step(DIRECTIONS[action]):
+            if event["type"] == "death": cause = event["cause"]
+        reward = (engine.score - score) * REWARD_PER_POINT
+        terminated = not engine.alive
+        if terminated: reward += DEATH_REWARD
+        truncated = not terminated and engine.ticks >= self.max_steps
+        return self.observe(), reward, terminated, truncated, self.info(cause)
+
+    def info(self, cause=None):
+        engine = self.engine
+        return {"score": engine.score, "ticks": engine.ticks, "cause": cause}
+
+    def observe(self):
+        engine, obs = self.engine, self.obs
+        owner = np.asarray(engine.board.owner, np.int16).reshape(engine.height, engine.width)
+        np.equal(owner, PLAYER, out=obs[CH_BODY], casting="unsafe")
+        np.greater(owner, PLAYER, out=obs[CH_ENEMY], casting="unsafe")
+        obs[CH_HEAD] = 0
+        hx, hy = engine.snake[0]
+        obs[CH_HEAD, hy, hx] = 1
+        obs[CH_FOOD] = 0
+        for x, y in engine.foods: obs[CH_FOOD, y, x] = 1
+        obs[CH_GOLD] = 0
+        for x, y in engine.golden_foods: obs[CH_GOLD, y, x] = 1
+        return obs
+
+
+# --- 3. 多进程向量化 ---
+def worker(remote, shm_name, shape, lo, hi, difficulty, seed, max_steps):
+    """子进程：负责第 lo..hi-1 个环境，观测直接写进共享内存，管道里只传动作、奖励和 info"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs = np.ndarray(shape, np.uint8, buffer=shm.buf)
+    envs = [SnakeEnv(difficulty, None if seed is None else seed + i, max_steps, obs[i]) for i in range(lo, hi)]
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                results = []
+                for env, action in zip(envs, data):
+                    _, reward, terminated, truncated, info = env.step(action)
+                    # 结束的环境立即重开，共享内存里随即就是新一局的观测
+                    if terminated or truncated: env.reset()
+                    results.append((reward, terminated, truncated, info))
+                remote.send(results)
+            elif cmd == "reset":
+                remote.send([env.reset(None if data is None else data + i)[1] for i, env in enumerate(envs, lo)])
+            elif cmd == "close":
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del envs, obs
+        shm.close()
+        remote.close()
+
+
+class VecSnakeEnv:
+    """n 个 SnakeEnv 分到 workers 个子进程里并行推进
+
+    全部观测放在一块 (n, 通道, 高, 宽) 的共享内存里，子进程原地写入，主进程不做任何复制；
+    reset / step 返回的 obs 就是这块内存的视图，下一次 step 会覆盖它。
+    某个环境结束时自动重开：返回的是新一局的观测，info 里是结束那一局的得分和死因。
+    """
+
+    def __init__(self, n, difficulty="NORMAL", workers=None, seed=None, max_steps=MAX_STEPS):
+        self.n = n
+        self.shape = (n,) + observation_shape(difficulty)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+        self.obs = np.ndarray(self.shape, np.uint8, buffer=self.shm.buf)
+        self.obs[:] = 0
+        workers = max(1, min(n, workers or os.cpu_count() or 1))
+        bounds = np.linspace(0, n, workers + 1).astype(int).tolist()
+        self.slices = list(zip(bounds[:-1], bounds[1:]))
+        self.remotes = []
+        self.processes = []
+        for lo, hi in self.slices:
+            remote, child = mp.Pipe()
+            process = mp.Process(target=worker, daemon=True,
+                                 args=(child, self.shm.name, self.shape, lo, hi, difficulty, seed, max_steps))
+            process.start()
+            child.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.closed = False
+
+    def reset(self, seed=None):
+        """全部环境重开，返回 (观测, info 列表)；给出 seed 时第 i 个环境用 seed + i"""
+        for remote in self.remotes: remote.send(("reset", seed))
+        infos = []
+        for remote in self.remotes: infos.extend(remote.recv())
+        return self.obs, infos
+
+    def step(self, actions):
+        """actions 为长度 n 的动作编号，返回 (观测, 奖励, terminated, truncated, info 列表)"""
+        actions = np.asarray(actions).tolist()
+        for remote, (lo, hi) in zip(self.remotes, self.slices): remote.send(("step", actions[lo:hi]))
+        results = []
+        for remote in self.remotes: results.extend(remote.recv())
+        rewards = np.array([r[0] for r in results], np.float32)
+        terminated = np.array([r[1] for r in results], bool)
+        truncated = np.array([r[2] for r in results], bool)
+        return self.obs, rewards, terminated, truncated, [r[3] for r in results]
+
+    def close(self):
+        if self.closed: return
+        self.closed = True
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes: process.join()
+        for remote in self.remotes: remote.close()
+        del self.obs
+        self.shm.close()
+        self.shm.unlink()
+
+
+def benchmark(n=64, difficulty="HARD", seconds=3.0, workers=None, seed=0):
+    """随机动作下向量化环境的推进速度 (环境步/秒)"""
+    env = VecSnakeEnv(n, difficulty, workers, seed)
+    try:
+        env.reset()
+        rng = np.random.default_rng(seed)
+        steps = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            env.step(rng.integers(0, N_ACTIONS, n))
+            steps += 1
+        return steps * n / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+if __name__ == "__main__":
+    print(f"single process: {benchmark(workers=1):.0f} env-steps/s")
+    print(f"{os.cpu_count()} workers: {benchmark():.0f} env-steps/s")
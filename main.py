@@ -1,16 +1,33 @@
+import time
+
+STARTUP_T0 = time.perf_counter()  # 启动计时起点，"import" 阶段从这里算起
+
 import pygame
 import random
-import os
-import json
 import math
 
+from engine import Engine, GRID_WIDTH, GRID_HEIGHT, UP, DOWN, LEFT, RIGHT, DIFFICULTY_SETTINGS
+from board import FOOD_GOLD
+from render import BoardLayer, SpriteCache, TextCache, DirtyRects, FontCache, HEAD_PAD
+from particles import ParticleSystem, MAX_PARTICLES, SHAPE_CIRCLE, SHAPE_RECT
+from replay import ReplayRecorder
+from profiler import FrameProfiler, StartupTimer
+from storage import BackgroundWriter, HistoryStore, load_json
+
 # --- 1. 基础配置 ---
 CELL_SIZE = 40
-GRID_WIDTH = 30
-GRID_HEIGHT = 20
 WINDOW_WIDTH = GRID_WIDTH * CELL_SIZE
 WINDOW_HEIGHT = GRID_HEIGHT * CELL_SIZE + 60
 FPS = 60
+TICK_RATE = 60  # 模拟固定每秒 60 次，与渲染帧率无关
+TICK_MS = 1000 / TICK_RATE
+MAX_TICKS_PER_FRAME = 10  # 落后太多时最多追 10 个 tick，其余丢弃，避免越追越慢
+DEATH_PAUSE_TICKS = 30  # 死亡后画面定格 0.5 秒再进入结束页，期间照常处理事件和绘制
+LEADERBOARD_PAGE = 10  # 排行榜每页显示的局数
+# 这些画面没有动画，阻塞等待输入；超时只是为了定期检查悬停和后台状态
+IDLE_STATES = ("MENU", "PAUSED", "THEME_SELECT", "GAMEOVER", "LEADERBOARD")
+IDLE_WAIT_MS = 250
+DIRTY_RECTS = False  # 只提交变化区域的脏矩形模式，适合软件渲染、带宽受限的设备
 
 # --- 2. 主题配色配置 (8大主题全家桶) ---
 THEMES = [
@@ -68,179 +85,38 @@ THEMES = [
 COLOR_FOOD_NORMAL = (255, 60, 60)
 COLOR_FOOD_GOLD = (255, 215, 0)
 COLOR_OVERLAY = (0, 0, 0, 180)
-
-# 方向向量
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
-DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+COLOR_CONFETTI = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255), (255, 255, 255)]
+PARTICLE_SIZE = (3, 6)
+CONFETTI_SIZE = (4, 8)
 
 DATA_FILE = "snake_data_v8.json"
-
-# 难度配置
-DIFFICULTY_SETTINGS = {
-    "EASY": {"speed": 200, "enemies": 1, "label": "EASY"},
-    "NORMAL": {"speed": 130, "enemies": 3, "label": "NORMAL"},
-    "HARD": {"speed": 90, "enemies": 6, "label": "HARD"}
+REPLAY_FILE = "snake_last_game.replay"  # 最近一局的回放，复现问题时使用
+HISTORY_FILE = "snake_history.db"  # 每局一行的对局历史 (SQLite)，供排行榜查询
+FONT_CACHE_FILE = "snake_fonts.json"  # 字体名解析出的文件路径，免得每次启动都枚举系统字体
+
+# 名称: (候选字体名, 字号, 是否粗体)，前面的找不到就用后面的
+FONTS = {
+    "font": (("arial",), 24, True),
+    "big_font": (("arial",), 48, True),
+    "cartoon_font": (("comicsansms", "arial"), 40, True),
+    "mono_font": (("couriernew",), 16, True),
 }
 
 
-# --- 3. 辅助绘制函数 ---
-def draw_detailed_head(screen, x, y, size, color, direction, is_boosting=False):
-    """绘制生动的蛇头"""
-    center_x = x + size // 2
-    center_y = y + size // 2
-
-    head_color = list(color)
-    if is_boosting:
-        head_color = [min(255, c + 50) for c in color]
-
-    # 耳朵
-    pygame.draw.circle(screen, head_color, (x + 6, y + 6), 10)
-    if direction in [UP, DOWN]:
-        pygame.draw.circle(screen, head_color, (x + size - 6, y + 6), 10)
-    else:
-        pygame.draw.circle(screen, head_color, (x + 6, y + size - 6), 10)
-
-    # 脸
-    pygame.draw.rect(screen, head_color, (x, y, size, size), border_radius=15)
-
-    # 眼睛
-    eye_radius = 7 if is_boosting else 6
-    pupil_radius = 4 if is_boosting else 3
-
-    eye_offset_x = direction[0] * 5
-    eye_offset_y = direction[1] * 5
-
-    left_eye = (center_x - 8 + eye_offset_x, center_y - 8 + eye_offset_y)
-    right_eye = (center_x + 8 + eye_offset_x, center_y - 8 + eye_offset_y)
-
-    if direction in [LEFT, RIGHT]:
-        left_eye = (center_x + eye_offset_x, center_y - 8)
-        right_eye = (center_x + eye_offset_x, center_y + 8)
-
-    pygame.draw.circle(screen, (255, 255, 255), left_eye, eye_radius)
-    pygame.draw.circle(screen, (0, 0, 0), (left_eye[0] + direction[0] * 2, left_eye[1] + direction[1] * 2),
-                       pupil_radius)
-    pygame.draw.circle(screen, (255, 255, 255), right_eye, eye_radius)
-    pygame.draw.circle(screen, (0, 0, 0), (right_eye[0] + direction[0] * 2, right_eye[1] + direction[1] * 2),
-                       pupil_radius)
-
-
-# --- 4. 敌方AI类 ---
-class EnemySnake:
-    def __init__(self, game):
-        self.game = game
-        self.alive = True
-        self.respawn()
-
-    def respawn(self):
-        while True:
-            x = random.randint(0, GRID_WIDTH - 1)
-            y = random.randint(0, GRID_HEIGHT - 1)
-            if x < 10: continue
-            self.body = [(x, y), (x + 1, y), (x + 2, y)]
-            self.prev_body = list(self.body)
-            self.direction = LEFT
-            break
-
-    def move(self):
-        if not self.alive: return
-        self.prev_body = list(self.body)
-        head = self.body[0]
-
-        target = None
-        min_dist = 9999
-        all_foods = self.game.foods + self.game.golden_foods
-        if not all_foods:
-            target = (random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1))
-        else:
-            for f in all_foods:
-                d = abs(head[0] - f[0]) + abs(head[1] - f[1])
-                if d < min_dist: min_dist, target = d, f
-
-        possible_moves = []
-        if target:
-            if target[0] < head[0]:
-                possible_moves.append(LEFT)
-            elif target[0] > head[0]:
-                possible_moves.append(RIGHT)
-            if target[1] < head[1]:
-                possible_moves.append(UP)
-            elif target[1] > head[1]:
-                possible_moves.append(DOWN)
-
-        random.shuffle(DIRECTIONS)
-        for d in DIRECTIONS:
-            if d not in possible_moves: possible_moves.append(d)
-
-        move_found = False
-        for move_dir in possible_moves:
-            if (move_dir[0] + self.direction[0] == 0) and (move_dir[1] + self.direction[1] == 0): continue
-            new_head = (head[0] + move_dir[0], head[1] + move_dir[1])
-            if self.is_safe(new_head):
-                self.direction = move_dir
-                self.body.insert(0, new_head)
-                move_found = True
-                break
-
-        if not move_found:
-            self.alive = False
-            return
-
-        head = self.body[0]
-        if head in self.game.foods:
-            self.game.foods.remove(head)
-            self.game.add_food()
-        elif head in self.game.golden_foods:
-            self.game.golden_foods.remove(head)
-        else:
-            self.body.pop()
-
-    def is_safe(self, pos):
-        x, y = pos
-        if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT: return False
-        if pos in self.game.snake: return False
-        if pos in self.body: return False
-        for enemy in self.game.enemies:
-            if enemy == self: continue
-            if enemy.alive and pos in enemy.body: return False
-        return True
-
-    def check_player_collision(self):
-        if not self.alive: return
-        if self.body[0] in self.game.snake:
-            self.alive = False
-            self.game.score += 100
-            self.game.create_particles(self.body[0], self.game.get_theme()["e_head"], count=15)
-
-    def draw(self, screen, offset_y, alpha):
-        if not self.alive: return
-        theme = self.game.get_theme()
-        for i in range(len(self.body)):
-            curr, prev = self.body[i], self.prev_body[min(i, len(self.prev_body) - 1)]
-            dx = prev[0] * CELL_SIZE + (curr[0] - prev[0]) * CELL_SIZE * alpha
-            dy = prev[1] * CELL_SIZE + (curr[1] - prev[1]) * CELL_SIZE * alpha
-            if i == 0:
-                draw_detailed_head(screen, dx + 2, dy + 2 + offset_y, CELL_SIZE - 4, theme["e_head"], self.direction)
-            else:
-                pygame.draw.rect(screen, theme["e_body"], (dx + 2, dy + 2 + offset_y, CELL_SIZE - 4, CELL_SIZE - 4),
-                                 border_radius=8)
-
-
-# --- 5. 游戏主类 ---
+# --- 3. 游戏主类 ---
 class Game:
-    def __init__(self):
+    def __init__(self, dirty_rects=DIRTY_RECTS):
+        self.startup = StartupTimer(STARTUP_T0)  # 第一帧画完后打印各阶段耗时
+        self.startup.mark("import")
         pygame.init()
         pygame.display.set_caption("Snake V8.0 (8 Themes Ultimate)")
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         self.clock = pygame.time.Clock()
+        self.startup.mark("display")
 
-        self.font = pygame.font.SysFont("Arial", 24, bold=True)
-        self.big_font = pygame.font.SysFont("Arial", 48, bold=True)
-        self.cartoon_font = pygame.font.SysFont("comicsansms", 40, bold=True)
-        if not self.cartoon_font: self.cartoon_font = self.big_font
+        self.writer = BackgroundWriter()  # 统计、回放和字体缓存交给后台线程原子写盘
+        self.fonts = FontCache(FONTS, FONT_CACHE_FILE, self.writer, self.startup)
+        self.startup.mark("fonts")
 
         # UI 初始化
         btn_w, btn_h = 340, 50
@@ -250,8 +126,12 @@ class Game:
         self.btn_easy = pygame.Rect(cx - btn_w // 2, cy + 20, btn_w, btn_h)
         self.btn_normal = pygame.Rect(cx - btn_w // 2, cy + 85, btn_w, btn_h)
         self.btn_hard = pygame.Rect(cx - btn_w // 2, cy + 150, btn_w, btn_h)
-        # 首页进入主题选择的按钮
-        self.btn_theme_menu = pygame.Rect(cx - btn_w // 2, cy + 230, btn_w, btn_h)
+        # 大地图的两个模式并排放在一行
+        self.btn_large = pygame.Rect(cx - btn_w // 2, cy + 215, btn_w // 2 - 5, btn_h)
+        self.btn_arena = pygame.Rect(cx + 5, cy + 215, btn_w // 2 - 5, btn_h)
+        # 首页进入主题选择和排行榜的按钮
+        self.btn_theme_menu = pygame.Rect(cx - btn_w // 2, cy + 295, btn_w // 2 - 5, btn_h)
+        self.btn_leaderboard = pygame.Rect(cx + 5, cy + 295, btn_w // 2 - 5, btn_h)
 
         # 结束页按钮
         self.btn_restart = pygame.Rect(cx - 100, cy + 20, 200, 50)
@@ -260,16 +140,74 @@ class Game:
         # 主题选择页面的返回按钮
         self.btn_theme_back = pygame.Rect(cx - 100, WINDOW_HEIGHT - 80, 200, 50)
 
-        self.state = "MENU"  # States: MENU, PLAYING, PAUSED, GAMEOVER, THEME_SELECT
+        # 排行榜页面：难度 / 主题筛选 (点击循环切换) 和翻页
+        self.btn_lb_difficulty = pygame.Rect(cx - 310, 120, 300, 50)
+        self.btn_lb_theme = pygame.Rect(cx + 10, 120, 300, 50)
+        self.btn_lb_prev = pygame.Rect(cx - 330, WINDOW_HEIGHT - 80, 200, 50)
+        self.btn_lb_next = pygame.Rect(cx + 130, WINDOW_HEIGHT - 80, 200, 50)
+        # 有悬停高亮的按钮，空闲画面在鼠标移入移出它们时才重画
+        self.buttons = [self.btn_easy, self.btn_normal, self.btn_hard, self.btn_large, self.btn_arena,
+                        self.btn_theme_menu, self.btn_leaderboard, self.btn_restart, self.btn_menu,
+                        self.btn_theme_back, self.btn_lb_difficulty, self.btn_lb_theme, self.btn_lb_prev,
+                        self.btn_lb_next]
+        self.shown_key = None  # 上一次画出的空闲画面，None 表示需要重画
+
+        self.state = "MENU"  # States: MENU, PLAYING, PAUSED, DYING, GAMEOVER, THEME_SELECT, LEADERBOARD
+        self.history = HistoryStore(HISTORY_FILE)  # 首次打开排行榜或写入时才连接数据库
+        self.lb_difficulty = None  # None 表示不筛选
+        self.lb_theme = None
+        self.lb_page = 0
+        self.lb_cache = None  # (查询键, (汇总, 行))，由后台线程填入；键含筛选、页码和数据版本
+        self.lb_pending = None  # 已排队、尚未返回的查询键
+        self.lb_version = 0  # 每写入一局加一，旧版本的查询结果不再使用
+        self.death_cause = None
         self.stats = self.load_data()
+        self.startup.mark("data")
         self.current_difficulty = DIFFICULTY_SETTINGS["NORMAL"]
         self.theme_index = 0
+        self.engine = Engine("NORMAL")
+        self.board_layer = BoardLayer(WINDOW_WIDTH, WINDOW_HEIGHT, CELL_SIZE, 60)
+        self.sprites = SpriteCache()
+        self.text = TextCache()
+        self.dirty = DirtyRects(dirty_rects)
+        self.particles = ParticleSystem(MAX_PARTICLES)
+        # 游戏里会放的粒子 (食物、各主题的加速拖尾、彩纸) 和各主题的蛇头 / 蛇身图块启动时就画好，对局中不再新建 Surface
+        self.particles.prepare(SHAPE_CIRCLE, [COLOR_FOOD_NORMAL] + [theme["p_body"] for theme in THEMES], PARTICLE_SIZE)
+        self.particles.prepare(SHAPE_RECT, COLOR_CONFETTI, CONFETTI_SIZE)
+        for theme in THEMES: self.sprites.prepare(theme, CELL_SIZE - 4)
+        self.profiler = FrameProfiler()  # F3 显示各阶段耗时，F4 采集 cProfile
+
+        # 全屏覆盖层和棋盘区域只建一次，每帧复用
+        self.board_rect = pygame.Rect(0, 60, WINDOW_WIDTH, WINDOW_HEIGHT - 60)
+        self.flash_surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.flash_surface.set_alpha(100)
+        self.flash_surface.fill((255, 255, 255))
+        self.overlay_surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+        self.overlay_surface.fill(COLOR_OVERLAY)
 
         # 初始化主题卡片区域
         self.theme_card_rects = []
         self.init_theme_rects()
 
         self.reset_game()
+        self.startup.mark("setup")
+
+    # 字体在第一次用到时才加载
+    @property
+    def font(self):
+        return self.fonts["font"]
+
+    @property
+    def big_font(self):
+        return self.fonts["big_font"]
+
+    @property
+    def cartoon_font(self):
+        return self.fonts["cartoon_font"]
+
+    @property
+    def mono_font(self):
+        return self.fonts["mono_font"]
 
     def init_theme_rects(self):
         """计算主题卡片的布局区域 (更新：支持8个主题，4列2行排布)"""
@@ -294,66 +232,57 @@ class Game:
 
     def load_data(self):
         default = {"high_score": 0, "games_played": 0}
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, 'r') as f:
-                    return {**default, **json.load(f)}
-            except:
-                pass
-        return default
+        data = load_json(DATA_FILE, {})
+        return {**default, **data} if isinstance(data, dict) else default
 
     def save_data(self):
-        with open(DATA_FILE, 'w') as f: json.dump(self.stats, f)
+        self.writer.submit_json(DATA_FILE, self.stats)
 
     def start_game(self, difficulty_key):
         self.current_difficulty = DIFFICULTY_SETTINGS[difficulty_key]
-        self.reset_game()
+        self.reset_game(difficulty_key)
         self.state = "PLAYING"
 
-    def reset_game(self):
-        sx, sy = 4, GRID_HEIGHT // 2
-        self.snake = [(sx, sy), (sx - 1, sy), (sx - 2, sy)]
-        self.snake_prev = list(self.snake)
-        self.direction = RIGHT
+    def reset_game(self, difficulty_key=None):
+        """重置画面层状态，规则状态由 engine 负责"""
+        self.engine.reset(difficulty_key)
+        self.recorder = ReplayRecorder(self.engine)
         self.next_direction = RIGHT
+        # move_timer: 距上次移动累计的模拟毫秒；sim_ticks: 本局已运行的 tick 数
+        self.move_timer = 0
+        self.sim_ticks = 0
+        self.accumulator = 0
 
-        self.score = 0
-        self.base_speed = self.current_difficulty["speed"]
-        self.move_delay = self.base_speed
-        self.last_move_time = pygame.time.get_ticks()
-        self.is_boosting = False
-
-        self.foods = []
-        self.golden_foods = []
-        for _ in range(5): self.add_food()
-
-        self.enemies = []
-        for _ in range(self.current_difficulty["enemies"]):
-            self.enemies.append(EnemySnake(self))
-
-        self.particles = []
+        self.particles.clear()
         self.flash_effect = 0
-        self.combo_count = 0
-        self.last_gold_time = 0
         self.floating_texts = []
 
-    def get_random_pos(self):
-        while True:
-            x, y = random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1)
-            if (x, y) not in self.snake and (x, y) not in self.foods and (x, y) not in self.golden_foods: return (x, y)
-
-    def add_food(self):
-        self.foods.append(self.get_random_pos())
-
-    def add_golden_food(self):
-        if len(self.golden_foods) < 3: self.golden_foods.append(self.get_random_pos())
+    def wait_events(self):
+        """阻塞到有输入或超时，返回这期间的全部事件"""
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        if event.type == pygame.NOEVENT: return []
+        events = [event] + pygame.event.get()
+        # 窗口被遮挡后重新露出时需要重画
+        if any(e.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE) for e in events): self.shown_key = None
+        return events
+
+    def idle_key(self):
+        """决定静态画面内容的状态，变化了才需要重画"""
+        mouse_pos = pygame.mouse.get_pos()
+        hovered = next((i for i, rect in enumerate(self.buttons) if rect.collidepoint(mouse_pos)), None)
+        loaded = self.state == "LEADERBOARD" and self.leaderboard() is not None
+        return (self.state, self.theme_index, hovered, self.lb_difficulty, self.lb_theme, self.lb_page, loaded)
 
-    def handle_input(self):
-        events = pygame.event.get()
+    def handle_input(self, events):
         mouse_pos = pygame.mouse.get_pos()
 
         for event in events:
             if event.type == pygame.QUIT: return False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+                self.dirty.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.profiler.capture()
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
 
                 if self.state == "MENU":
@@ -363,9 +292,15 @@ class Game:
                         self.start_game("NORMAL")
                     elif self.btn_hard.collidepoint(mouse_pos):
                         self.start_game("HARD")
+                    elif self.btn_large.collidepoint(mouse_pos):
+                        self.start_game("LARGE")
+                    elif self.btn_arena.collidepoint(mouse_pos):
+                        self.start_game("ARENA")
                     # 进入主题选择页面
                     elif self.btn_theme_menu.collidepoint(mouse_pos):
                         self.state = "THEME_SELECT"
+                    elif self.btn_leaderboard.collidepoint(mouse_pos):
+                        self.open_leaderboard()
 
                 elif self.state == "THEME_SELECT":
                     # 点击返回
@@ -375,6 +310,9 @@ class Game:
                         if rect.collidepoint(mouse_pos):
                             self.theme_index = i
 
+                elif self.state == "LEADERBOARD":
+                    self.click_leaderboard(mouse_pos)
+
                 elif self.state == "GAMEOVER":
                     if self.btn_restart.collidepoint(mouse_pos):
                         self.reset_game()
@@ -385,98 +323,61 @@ class Game:
             if event.type == pygame.KEYDOWN and self.state == "PLAYING":
                 if event.key == pygame.K_SPACE:
                     self.state = "PAUSED"
-                elif event.key == pygame.K_UP and self.direction != DOWN:
+                elif event.key == pygame.K_UP and self.engine.direction != DOWN:
                     self.next_direction = UP
-                elif event.key == pygame.K_DOWN and self.direction != UP:
+                elif event.key == pygame.K_DOWN and self.engine.direction != UP:
                     self.next_direction = DOWN
-                elif event.key == pygame.K_LEFT and self.direction != RIGHT:
+                elif event.key == pygame.K_LEFT and self.engine.direction != RIGHT:
                     self.next_direction = LEFT
-                elif event.key == pygame.K_RIGHT and self.direction != LEFT:
+                elif event.key == pygame.K_RIGHT and self.engine.direction != LEFT:
                     self.next_direction = RIGHT
             elif event.type == pygame.KEYDOWN and self.state == "PAUSED":
                 if event.key == pygame.K_SPACE: self.state = "PLAYING"
 
         if self.state == "PLAYING":
             keys = pygame.key.get_pressed()
-            if (keys[pygame.K_UP] and self.direction == UP) or \
-                    (keys[pygame.K_DOWN] and self.direction == DOWN) or \
-                    (keys[pygame.K_LEFT] and self.direction == LEFT) or \
-                    (keys[pygame.K_RIGHT] and self.direction == RIGHT):
-                self.is_boosting = True
-                self.move_delay = max(50, int(self.base_speed * 0.5))
-            else:
-                self.is_boosting = False
-                self.move_delay = self.base_speed
+            direction = self.engine.direction
+            self.engine.set_boost((keys[pygame.K_UP] and direction == UP) or
+                                  (keys[pygame.K_DOWN] and direction == DOWN) or
+                                  (keys[pygame.K_LEFT] and direction == LEFT) or
+                                  (keys[pygame.K_RIGHT] and direction == RIGHT))
 
         return True
 
     def update(self):
+        """推进一个固定的模拟 tick，所有计时 (移动、粒子、飘字、闪光) 都按 tick 计"""
+        if self.state == "DYING":
+            self.dying_ticks -= 1
+            if self.dying_ticks <= 0: self.game_over()
+            return
         if self.state != "PLAYING": return
-        current_time = pygame.time.get_ticks()
-        if random.random() < 0.005: self.add_golden_food()
-
-        if current_time - self.last_move_time > self.move_delay:
-            self.snake_prev = list(self.snake)
-            self.direction = self.next_direction
-            self.last_move_time = current_time
-
-            head_x, head_y = self.snake[0]
-            dx, dy = self.direction
-            new_head = (head_x + dx, head_y + dy)
-
-            if not (0 <= new_head[0] < GRID_WIDTH and 0 <= new_head[1] < GRID_HEIGHT):
-                self.game_over()
-                return
-            if new_head in self.snake:
-                self.game_over()
-                return
-            for enemy in self.enemies:
-                if enemy.alive and new_head in enemy.body:
-                    self.game_over()
+        engine = self.engine
+        self.sim_ticks += 1
+        self.move_timer += TICK_MS
+        if self.flash_effect > 0: self.flash_effect -= 1
+
+        if self.move_timer >= engine.move_delay:
+            self.move_timer -= engine.move_delay
+            self.recorder.record(self.next_direction)
+            for event in engine.step(self.next_direction):
+                if event["type"] == "food":
+                    self.create_particles(event["pos"], COLOR_FOOD_NORMAL)
+                elif event["type"] == "golden":
+                    self.flash_effect = 10
+                    self.create_confetti(event["pos"])
+                    msgs = ["Awesome!", "Amazing!", "Unstoppable!", "Godlike!"]
+                    self.add_floating_text(f"Combo x{event['combo']}! {random.choice(msgs)}",
+                                           (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 3))
+                elif event["type"] == "death":
+                    self.state = "DYING"
+                    self.death_cause = event["cause"]
+                    self.dying_ticks = DEATH_PAUSE_TICKS
                     return
 
-            self.snake.insert(0, new_head)
-            should_shrink = False
-
-            if new_head in self.foods:
-                self.score += 10
-                self.foods.remove(new_head)
-                self.add_food()
-                self.create_particles(new_head, COLOR_FOOD_NORMAL)
-
-            elif new_head in self.golden_foods:
-                self.score += 50
-                self.golden_foods.remove(new_head)
-                self.flash_effect = 10
-                self.create_confetti(new_head)
-                if current_time - self.last_gold_time < 5000:
-                    self.combo_count += 1
-                else:
-                    self.combo_count = 1
-                self.last_gold_time = current_time
-                msgs = ["Awesome!", "Amazing!", "Unstoppable!", "Godlike!"]
-                self.add_floating_text(f"Combo x{self.combo_count}! {random.choice(msgs)}",
-                                       (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 3))
-            else:
-                should_shrink = True
-
-            if should_shrink: self.snake.pop()
-
-            while len(self.snake_prev) < len(self.snake): self.snake_prev.append(self.snake_prev[-1])
-            if len(self.snake_prev) > len(self.snake): self.snake_prev = self.snake_prev[:len(self.snake)]
+            if engine.is_boosting:
+                self.create_particles(engine.snake[-1], self.get_theme()["p_body"], count=2)
 
-            for enemy in self.enemies:
-                enemy.move()
-                enemy.check_player_collision()
-
-            if self.is_boosting:
-                self.create_particles(self.snake[-1], self.get_theme()["p_body"], count=2)
-
-        for p in self.particles[:]:
-            p['life'] -= 1
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            if p['life'] <= 0: self.particles.remove(p)
+        self.particles.update()
 
         for ft in self.floating_texts[:]:
             ft['life'] -= 1
@@ -484,31 +385,67 @@ class Game:
             if ft['life'] <= 0: self.floating_texts.remove(ft)
 
     def game_over(self):
-        pygame.display.update()
-        pygame.time.delay(500)
         self.state = "GAMEOVER"
         self.stats["games_played"] += 1
-        if self.score > self.stats["high_score"]: self.stats["high_score"] = self.score
+        if self.engine.score > self.stats["high_score"]: self.stats["high_score"] = self.engine.score
         self.save_data()
+        self.writer.submit(REPLAY_FILE, self.recorder.replay.to_bytes())
+        engine = self.engine
+        self.writer.call(self.history.add, engine.score, engine.difficulty, self.get_theme()["name"],
+                         engine.time_ms, self.death_cause)
+        self.lb_version += 1
+
+    # --- 排行榜 ---
+    def open_leaderboard(self):
+        self.lb_page = 0
+        self.state = "LEADERBOARD"
+
+    def click_leaderboard(self, mouse_pos):
+        if self.btn_theme_back.collidepoint(mouse_pos):
+            self.state = "MENU"
+            return
+        if self.btn_lb_difficulty.collidepoint(mouse_pos):
+            options = [None] + list(DIFFICULTY_SETTINGS)
+            self.lb_difficulty = options[(options.index(self.lb_difficulty) + 1) % len(options)]
+            self.lb_page = 0
+        elif self.btn_lb_theme.collidepoint(mouse_pos):
+            options = [None] + [t["name"] for t in THEMES]
+            self.lb_theme = options[(options.index(self.lb_theme) + 1) % len(options)]
+            self.lb_page = 0
+        elif self.btn_lb_prev.collidepoint(mouse_pos) and self.lb_page > 0:
+            self.lb_page -= 1
+        elif self.btn_lb_next.collidepoint(mouse_pos):
+            page = self.leaderboard()
+            if page is None or len(page[1]) < LEADERBOARD_PAGE: return
+            self.lb_page += 1
+
+    def leaderboard(self):
+        """当前页的 (汇总, 行)，还没查好时返回 None
+
+        只查一页。查询排进后台写盘线程的队列，排在刚结束那局的写入之后，帧循环不等磁盘；
+        结果缓存到筛选、页码或数据版本变化为止。
+        """
+        key = (self.lb_difficulty, self.lb_theme, self.lb_page, self.lb_version)
+        cache = self.lb_cache
+        if cache is not None and cache[0] == key: return cache[1]
+        if self.lb_pending != key:
+            self.lb_pending = key
+            self.writer.call(self.query_leaderboard, key)
+        return None
+
+    def query_leaderboard(self, key):
+        """在后台线程里执行，查完整体替换 lb_cache"""
+        difficulty, theme, page, _ = key
+        self.lb_cache = (key, (self.history.summary(difficulty, theme),
+                               self.history.top(LEADERBOARD_PAGE, page * LEADERBOARD_PAGE, difficulty, theme)))
 
     def create_particles(self, pos, color, count=10):
-        px, py = pos[0] * CELL_SIZE + CELL_SIZE // 2, pos[1] * CELL_SIZE + CELL_SIZE // 2 + 60
-        for _ in range(count):
-            self.particles.append({
-                'type': 'circle', 'x': px, 'y': py,
-                'vx': random.uniform(-3, 3), 'vy': random.uniform(-3, 3),
-                'life': random.randint(10, 20), 'color': color, 'size': random.randint(3, 6)
-            })
+        px, py = pos[0] * CELL_SIZE + CELL_SIZE // 2, pos[1] * CELL_SIZE + CELL_SIZE // 2
+        self.particles.emit(px, py, count, speed=3, life=(10, 20), size=PARTICLE_SIZE, colors=[color])
 
     def create_confetti(self, pos):
-        px, py = pos[0] * CELL_SIZE + CELL_SIZE // 2, pos[1] * CELL_SIZE + CELL_SIZE // 2 + 60
-        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255), (255, 255, 255)]
-        for _ in range(40):
-            self.particles.append({
-                'type': 'rect', 'x': px, 'y': py,
-                'vx': random.uniform(-8, 8), 'vy': random.uniform(-8, 8),
-                'life': random.randint(30, 50), 'color': random.choice(colors), 'size': random.randint(4, 8)
-            })
+        px, py = pos[0] * CELL_SIZE + CELL_SIZE // 2, pos[1] * CELL_SIZE + CELL_SIZE // 2
+        self.particles.emit(px, py, 40, speed=8, life=(30, 50), size=CONFETTI_SIZE, colors=COLOR_CONFETTI, shape=SHAPE_RECT)
 
     def add_floating_text(self, text, pos):
         self.floating_texts.append({
@@ -520,17 +457,44 @@ class Game:
         color = (100, 100, 200) if rect.collidepoint(mouse_pos) else base_color
         pygame.draw.rect(self.screen, color, rect, border_radius=15)
         pygame.draw.rect(self.screen, (255, 255, 255), rect, 2, border_radius=15)
-        txt = self.font.render(text, True, (255, 255, 255))
+        txt = self.text.render(self.font, text, (255, 255, 255))
         self.screen.blit(txt, txt.get_rect(center=rect.center))
 
     def lerp(self, start, end, alpha):
         return start + (end - start) * alpha
 
+    def draw_enemy(self, enemy, origin, alpha, view):
+        if not enemy.alive: return
+        # 整条蛇都在蛇头 len(body) 格之内，蛇头离视野太远时整条跳过
+        x0, y0, x1, y1 = view
+        hx, hy = enemy.body[0]
+        reach = len(enemy.body)
+        if hx + reach < x0 or hx - reach >= x1 or hy + reach < y0 or hy - reach >= y1: return
+        self.draw_snake(enemy.body, "e_head", "e_body", enemy.direction, False, origin, alpha, view)
+
+    def draw_snake(self, body, head_role, body_role, direction, is_boosting, origin, alpha, view):
+        """按插值位置画一条蛇，只画视野 (含一格余量) 内的节"""
+        theme = self.get_theme()
+        size = CELL_SIZE - 4
+        segment = self.sprites.segment(theme, body_role, size, is_boosting)
+        ox, oy = origin
+        x0, y0, x1, y1 = view
+        for i, curr in enumerate(body):
+            if not (x0 - 1 <= curr[0] <= x1 and y0 - 1 <= curr[1] <= y1): continue
+            prev = body.prev(i)
+            dx = self.lerp(prev[0] * CELL_SIZE, curr[0] * CELL_SIZE, alpha)
+            dy = self.lerp(prev[1] * CELL_SIZE, curr[1] * CELL_SIZE, alpha)
+            if i == 0:
+                head = self.sprites.head(theme, head_role, direction, size, is_boosting)
+                self.dirty.mark(self.screen.blit(head, (dx + 2 + ox - HEAD_PAD, dy + 2 + oy - HEAD_PAD)))
+            else:
+                self.dirty.mark(self.screen.blit(segment, (dx + 2 + ox, dy + 2 + oy)))
+
     # --- 绘制主题选择界面 ---
     def draw_theme_selection(self):
         self.screen.fill((30, 30, 40))
 
-        title = self.big_font.render("THEME GALLERY", True, (255, 255, 255))
+        title = self.text.render(self.big_font, "THEME GALLERY", (255, 255, 255))
         self.screen.blit(title, title.get_rect(center=(WINDOW_WIDTH // 2, 70)))
 
         mouse_pos = pygame.mouse.get_pos()
@@ -544,23 +508,25 @@ class Game:
             # 选中状态的高亮边框
             if i == self.theme_index:
                 pygame.draw.rect(self.screen, (255, 215, 0), rect, 4, border_radius=10)
-                sel_txt = self.font.render("SELECTED", True, (255, 215, 0))
+                sel_txt = self.text.render(self.font, "SELECTED", (255, 215, 0))
                 self.screen.blit(sel_txt,
                                  (rect.right - sel_txt.get_width() - 5, rect.bottom - sel_txt.get_height() - 5))
             else:
                 pygame.draw.rect(self.screen, (100, 100, 100), rect, 2, border_radius=10)
 
             # 主题名称
-            name_txt = self.font.render(theme["name"], True, theme["text"])
+            name_txt = self.text.render(self.font, theme["name"], theme["text"])
             self.screen.blit(name_txt, (rect.x + 10, rect.y + 10))
 
             # 预览蛇
             preview_cx = rect.x + rect.width // 2
             preview_cy = rect.y + rect.height // 2 + 10
 
-            draw_detailed_head(self.screen, preview_cx + 20, preview_cy, 30, theme["p_head"], RIGHT)
-            pygame.draw.rect(self.screen, theme["p_body"], (preview_cx - 15, preview_cy, 30, 30), border_radius=5)
-            pygame.draw.rect(self.screen, theme["p_body"], (preview_cx - 50, preview_cy, 30, 30), border_radius=5)
+            self.screen.blit(self.sprites.head(theme, "p_head", RIGHT, 30),
+                             (preview_cx + 20 - HEAD_PAD, preview_cy - HEAD_PAD))
+            segment = self.sprites.segment(theme, "p_body", 30, radius=5)
+            self.screen.blit(segment, (preview_cx - 15, preview_cy))
+            self.screen.blit(segment, (preview_cx - 50, preview_cy))
 
             # 预览网格线
             pygame.draw.line(self.screen, theme["grid"], (rect.x, preview_cy), (rect.right, preview_cy), 1)
@@ -569,118 +535,165 @@ class Game:
         # 底部返回按钮
         self.draw_button(self.btn_theme_back, "Back to Menu", mouse_pos)
 
+    def draw_leaderboard(self):
+        self.screen.fill((30, 30, 40))
+        mouse_pos = pygame.mouse.get_pos()
+
+        title = self.text.render(self.big_font, "LEADERBOARD", (255, 255, 255))
+        self.screen.blit(title, title.get_rect(center=(WINDOW_WIDTH // 2, 70)))
+        self.draw_button(self.btn_lb_difficulty, f"Mode: {self.lb_difficulty or 'All'}", mouse_pos, (50, 100, 150))
+        self.draw_button(self.btn_lb_theme, f"Theme: {self.lb_theme or 'All'}", mouse_pos, (100, 50, 150))
+
+        page = self.leaderboard()
+        (count, best, avg_score, avg_ms), rows = page or ((0, None, None, None), [])
+        if page is None:
+            summary = "Loading..."
+        elif count:
+            summary = f"Games: {count}  |  Best: {best}  |  Avg: {avg_score:.1f}  |  Avg Time: {avg_ms / 1000:.1f}s"
+        else:
+            summary = "No games recorded yet"
+        summary_txt = self.text.render(self.font, summary, (200, 200, 200))
+        self.screen.blit(summary_txt, summary_txt.get_rect(center=(WINDOW_WIDTH // 2, 200)))
+
+        columns = (("#", 60), ("Score", 130), ("Mode", 260), ("Theme", 400), ("Time", 680), ("Cause", 800),
+                   ("Date", 960))
+        for name, x in columns:
+            self.screen.blit(self.text.render(self.font, name, (255, 215, 0)), (x, 240))
+        pygame.draw.line(self.screen, (100, 100, 100), (50, 272), (WINDOW_WIDTH - 50, 272), 1)
+        first = self.lb_page * LEADERBOARD_PAGE
+        for i, (score, difficulty, theme, duration_ms, cause, played_at) in enumerate(rows):
+            y = 280 + i * 40
+            cells = (str(first + i + 1), str(score), difficulty, theme, f"{duration_ms / 1000:.1f}s", cause or "-",
+                     time.strftime("%Y-%m-%d %H:%M", time.localtime(played_at)))
+            for text, (_, x) in zip(cells, columns):
+                self.screen.blit(self.text.render(self.font, text, (255, 255, 255)), (x, y))
+
+        page_txt = self.text.render(self.font, f"Page {self.lb_page + 1}", (200, 200, 200))
+        self.screen.blit(page_txt, page_txt.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 105)))
+        self.draw_button(self.btn_lb_prev, "< Prev", mouse_pos)
+        self.draw_button(self.btn_lb_next, "Next >", mouse_pos)
+        self.draw_button(self.btn_theme_back, "Back to Menu", mouse_pos)
+
+    def move_alpha(self):
+        """插值比例：上次移动后已过的模拟时间，加上累加器里还没走完一个 tick 的部分"""
+        return min((self.move_timer + self.accumulator) / self.engine.move_delay, 1.0)
+
+    def camera(self, alpha):
+        """摄像机左上角的世界像素坐标：跟随玩家蛇头的插值位置，并限制在棋盘范围内"""
+        engine = self.engine
+        max_x = max(0, engine.width * CELL_SIZE - WINDOW_WIDTH)
+        max_y = max(0, engine.height * CELL_SIZE - (WINDOW_HEIGHT - 60))
+        if not max_x and not max_y: return 0, 0
+        head, prev = engine.snake[0], engine.snake.prev(0)
+        hx = self.lerp(prev[0], head[0], alpha) * CELL_SIZE + CELL_SIZE // 2
+        hy = self.lerp(prev[1], head[1], alpha) * CELL_SIZE + CELL_SIZE // 2
+        return (int(min(max(hx - WINDOW_WIDTH // 2, 0), max_x)),
+                int(min(max(hy - (WINDOW_HEIGHT - 60) // 2, 0), max_y)))
+
     def draw(self):
         theme = self.get_theme()
+        alpha = self.move_alpha()
+        cam_x, cam_y = self.camera(alpha)
+        # 非游戏画面、闪光帧、摄像机移动以及它们切换的那一帧都整屏重画
+        self.dirty.watch((self.state, self.theme_index, self.flash_effect > 0, cam_x, cam_y))
+        if self.state != "PLAYING" or self.flash_effect > 0: self.dirty.invalidate()
 
         if self.state == "THEME_SELECT":
             self.draw_theme_selection()
             return
+        if self.state == "LEADERBOARD":
+            self.draw_leaderboard()
+            return
 
-        self.screen.fill(theme["bg"])
         mouse_pos = pygame.mouse.get_pos()
 
         if self.state == "MENU":
-            title = self.big_font.render("SNAKE BATTLE", True, theme["p_head"])
+            self.screen.fill(theme["bg"])
+            title = self.text.render(self.big_font, "SNAKE BATTLE", theme["p_head"])
             self.screen.blit(title, title.get_rect(center=(WINDOW_WIDTH // 2, 80)))
-            stats = self.font.render(f"High: {self.stats['high_score']} | Games: {self.stats['games_played']}", True,
+            stats = self.text.render(self.font,
+                                     f"High: {self.stats['high_score']} | Games: {self.stats['games_played']}",
                                      theme["text"])
             self.screen.blit(stats, stats.get_rect(center=(WINDOW_WIDTH // 2, 130)))
 
             self.draw_button(self.btn_easy, "EASY (Slow, 1 Enemy)", mouse_pos, (50, 150, 50))
             self.draw_button(self.btn_normal, "NORMAL (Med, 3 Enemies)", mouse_pos, (50, 100, 150))
             self.draw_button(self.btn_hard, "HARD (Fast, 6 Enemies)", mouse_pos, (150, 50, 50))
+            self.draw_button(self.btn_large, "LARGE 100x100", mouse_pos, (150, 100, 30))
+            self.draw_button(self.btn_arena, "ARENA 400 Foes", mouse_pos, (150, 30, 100))
 
-            # 主题画廊入口
-            self.draw_button(self.btn_theme_menu, "Theme Gallery (Select Style)", mouse_pos, (100, 50, 150))
+            # 主题画廊和排行榜入口
+            self.draw_button(self.btn_theme_menu, "Theme Gallery", mouse_pos, (100, 50, 150))
+            self.draw_button(self.btn_leaderboard, "Leaderboard", mouse_pos, (50, 120, 120))
 
-            hint = self.font.render("Hold Direction Key to BOOST!", True, (255, 200, 0))
+            hint = self.text.render(self.font, "Hold Direction Key to BOOST!", (255, 200, 0))
             self.screen.blit(hint, hint.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 40)))
             return
 
+        engine = self.engine
         offset_y = 60
-        pygame.draw.rect(self.screen, (30, 30, 50), (0, 0, WINDOW_WIDTH, 60))
-        score_txt = self.font.render(f"Score: {self.score}", True, (255, 255, 255))
-        mode_txt = self.font.render(f"Mode: {self.current_difficulty['label']}", True, (200, 200, 200))
-        self.screen.blit(score_txt, (20, 15))
-        self.screen.blit(mode_txt, (WINDOW_WIDTH - 250, 15))
-
-        if self.combo_count > 1:
-            combo_txt = self.cartoon_font.render(f"Combo: {self.combo_count}", True, (255, 215, 0))
-            self.screen.blit(combo_txt, (WINDOW_WIDTH // 2 - combo_txt.get_width() // 2, 10))
-
-        for x in range(0, WINDOW_WIDTH, CELL_SIZE):
-            pygame.draw.line(self.screen, theme["grid"], (x, offset_y), (x, WINDOW_HEIGHT))
-        for y in range(offset_y, WINDOW_HEIGHT, CELL_SIZE):
-            pygame.draw.line(self.screen, theme["grid"], (0, y), (WINDOW_WIDTH, y))
-
-        for fx, fy in self.foods:
-            pygame.draw.rect(self.screen, COLOR_FOOD_NORMAL,
-                             (fx * CELL_SIZE + 4, fy * CELL_SIZE + 4 + offset_y, CELL_SIZE - 8, CELL_SIZE - 8),
-                             border_radius=10)
-        for gx, gy in self.golden_foods:
-            glow = abs(math.sin(pygame.time.get_ticks() * 0.005)) * 4
-            pygame.draw.rect(self.screen, COLOR_FOOD_GOLD,
-                             (gx * CELL_SIZE + 2 - glow, gy * CELL_SIZE + 2 + offset_y - glow, CELL_SIZE - 4 + glow * 2,
-                              CELL_SIZE - 4 + glow * 2), border_radius=12)
-
-        curr_time = pygame.time.get_ticks()
-        alpha = min((curr_time - self.last_move_time) / self.move_delay, 1.0)
-
-        for enemy in self.enemies: enemy.draw(self.screen, offset_y, alpha)
-
-        for i, (cx, cy) in enumerate(self.snake):
-            prev = self.snake_prev[i] if i < len(self.snake_prev) else (cx, cy)
-            dx = self.lerp(prev[0] * CELL_SIZE, cx * CELL_SIZE, alpha)
-            dy = self.lerp(prev[1] * CELL_SIZE, cy * CELL_SIZE, alpha)
-
-            if i == 0:
-                draw_detailed_head(self.screen, dx + 2, dy + 2 + offset_y, CELL_SIZE - 4, theme["p_head"],
-                                   self.direction, self.is_boosting)
+        # 底色、网格线和状态栏都在预渲染的背景层里；脏矩形模式下只还原上一帧画过的区域
+        # 摄像机可能停在亚格偏移处，两条路径都要按同一个 shift 错开网格
+        shift = (cam_x % CELL_SIZE, cam_y % CELL_SIZE)
+        if self.dirty.full:
+            self.board_layer.draw(self.screen, THEMES, self.theme_index, shift)
+        else:
+            self.dirty.restore(self.screen, self.board_layer, THEMES, self.theme_index, shift)
+        mark = self.dirty.mark
+        score_txt = self.text.render(self.font, f"Score: {engine.score}", (255, 255, 255))
+        mode_txt = self.text.render(self.font, f"Mode: {self.current_difficulty['label']}", (200, 200, 200))
+        mark(self.screen.blit(score_txt, (20, 15)))
+        mark(self.screen.blit(mode_txt, (WINDOW_WIDTH - 250, 15)))
+
+        if engine.combo_count > 1:
+            combo_txt = self.text.render(self.cartoon_font, f"Combo: {engine.combo_count}", (255, 215, 0))
+            mark(self.screen.blit(combo_txt, (WINDOW_WIDTH // 2 - combo_txt.get_width() // 2, 10)))
+
+        # 世界坐标加上 origin 即屏幕坐标；view 为可见的格子范围，之外的东西都不画
+        ox, oy = -cam_x, offset_y - cam_y
+        board_rect = self.board_rect
+        view = (cam_x // CELL_SIZE, cam_y // CELL_SIZE,
+                min(engine.width, (cam_x + board_rect.width) // CELL_SIZE + 1),
+                min(engine.height, (cam_y + board_rect.height) // CELL_SIZE + 1))
+        self.screen.set_clip(board_rect)
+
+        glow = abs(math.sin(self.sim_ticks * TICK_MS * 0.005)) * 4
+        for (fx, fy), kind in engine.food.in_rect(*view):
+            if kind == FOOD_GOLD:
+                mark(pygame.draw.rect(self.screen, COLOR_FOOD_GOLD,
+                                      (fx * CELL_SIZE + 2 + ox - glow, fy * CELL_SIZE + 2 + oy - glow,
+                                       CELL_SIZE - 4 + glow * 2, CELL_SIZE - 4 + glow * 2), border_radius=12))
             else:
-                body_color = [min(255, c + 40) for c in theme["p_body"]] if self.is_boosting else theme["p_body"]
-                pygame.draw.rect(self.screen, body_color, (dx + 2, dy + 2 + offset_y, CELL_SIZE - 4, CELL_SIZE - 4),
-                                 border_radius=8)
-
-        for p in self.particles:
-            if p['type'] == 'circle':
-                pygame.draw.circle(self.screen, p['color'], (int(p['x']), int(p['y'])), int(p['size']))
-            elif p['type'] == 'rect':
-                rect_size = p['size']
-                if (pygame.time.get_ticks() // 50) % 2 == 0:
-                    w, h = rect_size, rect_size / 2
-                else:
-                    w, h = rect_size / 2, rect_size
-                pygame.draw.rect(self.screen, p['color'], (p['x'], p['y'], w, h))
+                mark(pygame.draw.rect(self.screen, COLOR_FOOD_NORMAL,
+                                      (fx * CELL_SIZE + 4 + ox, fy * CELL_SIZE + 4 + oy, CELL_SIZE - 8, CELL_SIZE - 8),
+                                      border_radius=10))
+
+        for enemy in engine.enemies: self.draw_enemy(enemy, (ox, oy), alpha, view)
+        self.draw_snake(engine.snake, "p_head", "p_body", engine.direction, engine.is_boosting, (ox, oy), alpha, view)
+
+        # 彩纸每 50 毫秒在横条和竖条之间切换
+        self.dirty.mark_all(self.particles.draw(self.screen, int(self.sim_ticks * TICK_MS) // 50 % 2 == 1,
+                                                (ox, oy), board_rect))
+        self.screen.set_clip(None)
 
         for ft in self.floating_texts:
-            txt_surf = self.cartoon_font.render(ft['text'], True, ft['color'])
-            outline = self.cartoon_font.render(ft['text'], True, (0, 0, 0))
-            self.screen.blit(outline, (ft['x'] - txt_surf.get_width() // 2 + 2, ft['y'] + 2))
-            self.screen.blit(txt_surf, (ft['x'] - txt_surf.get_width() // 2, ft['y']))
-
-        if self.flash_effect > 0:
-            s = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-            s.set_alpha(100)
-            s.fill((255, 255, 255))
-            self.screen.blit(s, (0, 0))
-            self.flash_effect -= 1
+            txt_surf = self.text.outlined(self.cartoon_font, ft['text'], ft['color'])
+            mark(self.screen.blit(txt_surf, (ft['x'] - (txt_surf.get_width() - 2) // 2, ft['y'])))
+
+        if self.flash_effect > 0: self.screen.blit(self.flash_surface, (0, 0))
 
         if self.state == "PAUSED":
-            overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-            overlay.fill(COLOR_OVERLAY)
-            self.screen.blit(overlay, (0, 0))
-            txt = self.big_font.render("PAUSED", True, (255, 255, 255))
+            self.screen.blit(self.overlay_surface, (0, 0))
+            txt = self.text.render(self.big_font, "PAUSED", (255, 255, 255))
             self.screen.blit(txt, txt.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
 
         if self.state == "GAMEOVER":
-            overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-            overlay.fill(COLOR_OVERLAY)
-            self.screen.blit(overlay, (0, 0))
+            self.screen.blit(self.overlay_surface, (0, 0))
             panel = pygame.Rect(WINDOW_WIDTH // 2 - 150, WINDOW_HEIGHT // 2 - 120, 300, 280)
             pygame.draw.rect(self.screen, (50, 50, 70), panel, border_radius=15)
             pygame.draw.rect(self.screen, (255, 255, 255), panel, 2, border_radius=15)
-            over_txt = self.big_font.render("GAME OVER", True, (255, 100, 100))
-            score_txt = self.font.render(f"Final Score: {self.score}", True, (255, 255, 255))
+            over_txt = self.text.render(self.big_font, "GAME OVER", (255, 100, 100))
+            score_txt = self.text.render(self.font, f"Final Score: {engine.score}", (255, 255, 255))
             self.screen.blit(over_txt, over_txt.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 80)))
             self.screen.blit(score_txt, score_txt.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 30)))
             self.draw_button(self.btn_restart, "Play Again", mouse_pos)
@@ -689,12 +702,41 @@ class Game:
     def run(self):
         running = True
         while running:
-            running = self.handle_input()
-            self.update()
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            profiler = self.profiler
+            # 静态画面不按帧率空转，而是阻塞等待输入；打开 F3 覆盖层时照常逐帧运行以便测量
+            idle = self.state in IDLE_STATES and not profiler.visible
+            if idle:
+                # 画面已经是最新的才阻塞，刚切换过来或需要重画时先画一帧
+                events = self.wait_events() if self.idle_key() == self.shown_key else pygame.event.get()
+                self.clock.tick()  # 等待的时间不计入模拟
+            else:
+                elapsed = self.clock.tick(FPS)
+                events = pygame.event.get()
+            profiler.start()
+            running = self.handle_input(events)
+            profiler.mark("input")
+            if not idle:
+                # 固定步长：按真实经过的时间补足整数个 tick，余下的留给下一帧并用于插值
+                self.accumulator = min(self.accumulator + elapsed, MAX_TICKS_PER_FRAME * TICK_MS)
+                while self.accumulator >= TICK_MS:
+                    self.update()
+                    self.accumulator -= TICK_MS
+            profiler.mark("update")
+            key = self.idle_key()
+            if not idle or key != self.shown_key:
+                self.draw()
+                self.dirty.mark(profiler.draw(self.screen, self.text, self.mono_font))
+                profiler.mark("draw")
+                self.dirty.present()
+                profiler.mark("present")
+                self.shown_key = key
+            profiler.end_frame()
+            if not self.startup.done:
+                self.startup.mark("first_frame")
+                print(self.startup.finish())
         pygame.quit()
+        self.writer.close()
+        self.history.close()
 
 
 if __name__ == "__main__":
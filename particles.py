@@ -0,0 +1,130 @@
+import numpy as np
+import pygame
+
+MAX_PARTICLES = 512  # 同时存在的粒子上限，超出的新粒子直接丢弃
+
+# 粒子形状
+SHAPE_CIRCLE = 0
+SHAPE_RECT = 1  # 彩纸：按时间在横竖两种长条间切换
+
+
+class ParticleSystem:
+    """结构数组形式的粒子池
+
+    位置、速度、寿命、大小、颜色各存一个预分配数组，存活的粒子始终紧凑地排在前 count 个，
+    更新是整段的向量运算，死亡粒子用布尔掩码一次压缩掉。颜色存为调色板下标，
+    绘制时按 (形状, 颜色, 宽, 高) 取预渲染的小图块，用一次 screen.blits 批量画出。
+    """
+
+    def __init__(self, capacity=MAX_PARTICLES, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.life = np.zeros(capacity, np.int16)
+        self.size = np.zeros(capacity, np.int16)
+        self.color = np.zeros(capacity, np.int16)
+        self.shape = np.zeros(capacity, np.int8)
+        self.palette = []
+        self.palette_index = {}
+        self.sprites = {}
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def color_id(self, color):
+        color = tuple(color)
+        i = self.palette_index.get(color)
+        if i is None:
+            i = self.palette_index[color] = len(self.palette)
+            self.palette.append(color)
+        return i
+
+    def emit(self, x, y, count, speed, life, size, colors, shape=SHAPE_CIRCLE):
+        """在 (x, y) 放出 count 个粒子：速度在 ±speed 内均匀分布，life / size 为闭区间，
+        颜色从 colors 中随机选取；池满时多出的粒子不再生成"""
+        count = min(count, self.capacity - self.count)
+        if count <= 0: return
+        s = slice(self.count, self.count + count)
+        rng = self.rng
+        self.x[s] = x
+        self.y[s] = y
+        self.vx[s] = rng.uniform(-speed, speed, count)
+        self.vy[s] = rng.uniform(-speed, speed, count)
+        self.life[s] = rng.integers(life[0], life[1] + 1, count)
+        self.size[s] = rng.integers(size[0], size[1] + 1, count)
+        ids = np.array([self.color_id(c) for c in colors], np.int16)
+        self.color[s] = ids[rng.integers(0, len(ids), count)]
+        self.shape[s] = shape
+        self.count += count
+
+    def prepare(self, shape, colors, size):
+        """预先画好 emit(shape=shape, colors=colors, size=size) 的粒子会用到的全部图块，
+        之后放这种粒子时绘制不再新建 Surface"""
+        for color in colors:
+            color = self.color_id(color)
+            for n in range(size[0], size[1] + 1):
+                if shape == SHAPE_CIRCLE:
+                    self.sprite(shape, color, n * 2, n * 2)
+                else:
+                    self.sprite(shape, color, n, n // 2)
+                    self.sprite(shape, color, n // 2, n)
+
+    def update(self):
+        n = self.count
+        if not n: return
+        self.life[:n] -= 1
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        alive = self.life[:n] > 0
+        k = int(alive.sum())
+        if k < n:
+            for arr in (self.x, self.y, self.vx, self.vy, self.life, self.size, self.color, self.shape):
+                arr[:k] = arr[:n][alive]
+        self.count = k
+
+    def sprite(self, shape, color, w, h):
+        key = (shape, color, w, h)
+        surface = self.sprites.get(key)
+        if surface is None:
+            surface = pygame.Surface((max(w, 1), max(h, 1)), pygame.SRCALPHA)
+            if shape == SHAPE_CIRCLE:
+                pygame.draw.circle(surface, self.palette[color], (w // 2, h // 2), w // 2)
+            else:
+                surface.fill(self.palette[color])
+            if pygame.display.get_surface(): surface = surface.convert_alpha()
+            self.sprites[key] = surface
+        return surface
+
+    def draw(self, screen, flip=False, origin=(0, 0), view=None):
+        """批量绘制，返回每个粒子的屏幕矩形；flip 为 True 时彩纸画成竖条
+
+        粒子坐标加上 origin 即屏幕坐标；给出 view (屏幕矩形) 时只画与之相交的粒子。
+        """
+        n = self.count
+        if not n: return []
+        xs = self.x[:n].astype(np.int32) + int(origin[0])
+        ys = self.y[:n].astype(np.int32) + int(origin[1])
+        sizes = self.size[:n]
+        circle = self.shape[:n] == SHAPE_CIRCLE
+        # 圆以 (x, y) 为圆心，彩纸以 (x, y) 为左上角
+        left = np.where(circle, xs - sizes, xs)
+        top = np.where(circle, ys - sizes, ys)
+        half = sizes // 2
+        w = np.where(circle, sizes * 2, half if flip else sizes)
+        h = np.where(circle, sizes * 2, sizes if flip else half)
+        shapes = self.shape[:n]
+        colors = self.color[:n]
+        if view is not None:
+            visible = (left < view.right) & (left + w > view.left) & (top < view.bottom) & (top + h > view.top)
+            left, top, w, h, shapes, colors = (a[visible] for a in (left, top, w, h, shapes, colors))
+        left, top, w, h, shapes, colors = (a.tolist() for a in (left, top, w, h, shapes, colors))
+        sprite = self.sprite
+        return screen.blits([(sprite(shapes[i], colors[i], w[i], h[i]), (left[i], top[i]))
+                             for i in range(len(left))])
@@ -0,0 +1,133 @@
+import cProfile
+import time
+from collections import deque
+
+import pygame
+
+PROFILE_WINDOW = 300  # 每个阶段保留最近 300 帧的耗时
+PROFILE_REFRESH = 30  # 覆盖层每 30 帧重新统计一次分位数
+PROFILE_SECONDS = 5  # 热键触发的 cProfile 采集时长 (秒)
+PHASES = ("input", "update", "draw", "present")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class FrameProfiler:
+    """按阶段记录 Game.run 每帧的耗时
+
+    每帧 start() 之后，每个阶段结束时 mark(名称)，记下距上一个标记的毫秒数。
+    各阶段保留最近 PROFILE_WINDOW 帧，stats() 给出 p50 / p95 / p99。
+    capture() 启动一次 cProfile 采集，duration 秒后自动写出 .pstats 文件。
+    """
+
+    def __init__(self, window=PROFILE_WINDOW):
+        self.samples = {name: deque(maxlen=window) for name in PHASES + ("frame",)}
+        self.visible = False
+        self.frame_start = self.last = time.perf_counter()
+        self.frames = 0
+        self.cached = {}
+        self.profile = None
+        self.profile_end = 0
+        self.profile_path = None
+        self.last_dump = None
+        self.panel = None  # 覆盖层底板，尺寸不变时每帧复用
+
+    def start(self):
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.samples[name].append((now - self.last) * 1000)
+        self.last = now
+
+    def end_frame(self):
+        self.samples["frame"].append((self.last - self.frame_start) * 1000)
+        self.frames += 1
+        if self.profile and time.perf_counter() >= self.profile_end: self.finish_capture()
+
+    def stats(self):
+        """{阶段: (p50, p95, p99)}，单位毫秒"""
+        result = {}
+        for name, values in self.samples.items():
+            values = sorted(values)
+            result[name] = (percentile(values, 0.50), percentile(values, 0.95), percentile(values, 0.99))
+        return result
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.cached = {}
+
+    # --- cProfile 采集 ---
+    def capture(self, duration=PROFILE_SECONDS):
+        if self.profile: return
+        self.profile_path = time.strftime("snake_profile_%Y%m%d_%H%M%S.pstats")
+        self.profile_end = time.perf_counter() + duration
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def finish_capture(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.profile_path)
+        self.last_dump = self.profile_path
+        self.profile = None
+
+    # --- 覆盖层 ---
+    def draw(self, screen, text, font):
+        """在左下角画出各阶段分位数，返回覆盖层矩形 (供脏矩形模式标记)"""
+        if not self.visible: return None
+        if not self.cached or self.frames % PROFILE_REFRESH == 0: self.cached = self.stats()
+        lines = [f"{'phase':8s}{'p50':>8s}{'p95':>8s}{'p99':>8s}"]
+        for name, (p50, p95, p99) in self.cached.items():
+            lines.append(f"{name:8s}{p50:8.2f}{p95:8.2f}{p99:8.2f}")
+        if self.profile:
+            lines.append(f"profiling... {max(0.0, self.profile_end - time.perf_counter()):.1f}s")
+        elif self.last_dump:
+            lines.append(f"saved {self.last_dump}")
+
+        surfaces = [text.render(font, line, (0, 255, 0)) for line in lines]
+        width = max(s.get_width() for s in surfaces) + 20
+        height = sum(s.get_height() for s in surfaces) + 20
+        rect = pygame.Rect(10, screen.get_height() - height - 10, width, height)
+        if self.panel is None or self.panel.get_size() != rect.size:
+            self.panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+            self.panel.fill((0, 0, 0, 190))
+        screen.blit(self.panel, rect)
+        y = rect.y + 10
+        for s in surfaces:
+            screen.blit(s, (rect.x + 10, y))
+            y += s.get_height()
+        return rect
+
+
+# --- 启动耗时 ---
+class StartupTimer:
+    """启动各阶段的耗时：mark(名称) 记下距上一个标记的毫秒数
+
+    穿插在别的阶段里的开销 (如懒加载字体) 用 add 单独记到自己的阶段，并从当时所在的阶段里扣除。
+    """
+
+    def __init__(self, start=None):
+        self.last = time.perf_counter() if start is None else start
+        self.phases = {}
+        self.borrowed = 0.0
+        self.done = False
+
+    def add(self, name, ms):
+        if self.done: return
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+        self.borrowed += ms
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self.last) * 1000 - self.borrowed
+        self.last = now
+        self.borrowed = 0.0
+
+    def finish(self):
+        """停止记录并返回一行报告"""
+        self.done = True
+        total = sum(self.phases.values())
+        return f"startup {total:.1f} ms: " + " | ".join(f"{name} {ms:.1f}" for name, ms in self.phases.items())
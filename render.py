@@ -0,0 +1,312 @@
+import os
+import time
+import pygame
+from collections import OrderedDict
+
+from engine import UP, DOWN, LEFT, RIGHT
+from storage import load_json
+
+SPRITE_CACHE_LIMIT = 256  # 精灵缓存最多保留的图块数，要装得下启动时为各主题画好的蛇头 / 蛇身
+TEXT_CACHE_LIMIT = 256  # 文字缓存最多保留的图块数
+HEAD_PAD = 4  # 蛇头耳朵会伸出格子 4 像素，预渲染时四周各留出这么多
+
+
+# --- 1. 辅助绘制函数 ---
+def draw_detailed_head(screen, x, y, size, color, direction, is_boosting=False):
+    """绘制生动的蛇头"""
+    center_x = x + size // 2
+    center_y = y + size // 2
+
+    head_color = list(color)
+    if is_boosting:
+        head_color = [min(255, c + 50) for c in color]
+
+    # 耳朵
+    pygame.draw.circle(screen, head_color, (x + 6, y + 6), 10)
+    if direction in [UP, DOWN]:
+        pygame.draw.circle(screen, head_color, (x + size - 6, y + 6), 10)
+    else:
+        pygame.draw.circle(screen, head_color, (x + 6, y + size - 6), 10)
+
+    # 脸
+    pygame.draw.rect(screen, head_color, (x, y, size, size), border_radius=15)
+
+    # 眼睛
+    eye_radius = 7 if is_boosting else 6
+    pupil_radius = 4 if is_boosting else 3
+
+    eye_offset_x = direction[0] * 5
+    eye_offset_y = direction[1] * 5
+
+    left_eye = (center_x - 8 + eye_offset_x, center_y - 8 + eye_offset_y)
+    right_eye = (center_x + 8 + eye_offset_x, center_y - 8 + eye_offset_y)
+
+    if direction in [LEFT, RIGHT]:
+        left_eye = (center_x + eye_offset_x, center_y - 8)
+        right_eye = (center_x + eye_offset_x, center_y + 8)
+
+    pygame.draw.circle(screen, (255, 255, 255), left_eye, eye_radius)
+    pygame.draw.circle(screen, (0, 0, 0), (left_eye[0] + direction[0] * 2, left_eye[1] + direction[1] * 2),
+                       pupil_radius)
+    pygame.draw.circle(screen, (255, 255, 255), right_eye, eye_radius)
+    pygame.draw.circle(screen, (0, 0, 0), (right_eye[0] + direction[0] * 2, right_eye[1] + direction[1] * 2),
+                       pupil_radius)
+
+
+# --- 2. 静态棋盘层 ---
+class BoardLayer:
+    """每个主题一张预渲染的背景图 (底色 + 网格线 + 顶部状态栏)
+
+    背景在同一主题内不会变化，每帧只需 blit 一次；
+    只有 theme_index 变化时才重新生成。图比窗口多出一格，摄像机滚动时按亚格偏移错开网格部分，
+    网格线的绘制量只与窗口大小有关。
+    """
+
+    def __init__(self, width, height, cell_size, offset_y):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.offset_y = offset_y
+        self.theme_index = None
+        self.surface = None
+
+    def get(self, themes, theme_index):
+        if theme_index != self.theme_index:
+            self.surface = self.build(themes[theme_index])
+            self.theme_index = theme_index
+        return self.surface
+
+    def build(self, theme):
+        width, height = self.width + self.cell_size, self.height + self.cell_size
+        surface = pygame.Surface((width, height))
+        surface.fill(theme["bg"])
+        pygame.draw.rect(surface, (30, 30, 50), (0, 0, width, self.offset_y))
+        for x in range(0, width, self.cell_size):
+            pygame.draw.line(surface, theme["grid"], (x, self.offset_y), (x, height))
+        for y in range(self.offset_y, height, self.cell_size):
+            pygame.draw.line(surface, theme["grid"], (0, y), (width, y))
+        if pygame.display.get_surface(): surface = surface.convert()
+        return surface
+
+    def draw(self, screen, themes, theme_index, shift=(0, 0)):
+        """整屏画出背景；shift 为摄像机位置对格子大小取余，状态栏不动，网格部分错开"""
+        surface = self.get(themes, theme_index)
+        sx, sy = shift
+        screen.blit(surface, (0, 0), (0, 0, self.width, self.offset_y))
+        screen.blit(surface, (0, self.offset_y), (sx, self.offset_y + sy, self.width, self.height - self.offset_y))
+
+    def patch(self, screen, themes, theme_index, rect, shift=(0, 0)):
+        """只把 rect 这块还原成背景，错开方式与 draw 相同：状态栏不动，网格部分按 shift 取图"""
+        surface = self.get(themes, theme_index)
+        top = self.offset_y
+        if rect.top < top:
+            hud = rect.clip((0, 0, self.width, top))
+            screen.blit(surface, hud, hud)
+        if rect.bottom > top:
+            grid = rect.clip((0, top, self.width, self.height - top))
+            screen.blit(surface, grid, grid.move(shift))
+
+
+# --- 3. 精灵缓存 ---
+class SpriteCache:
+    """蛇头和蛇身的预渲染图块，键为 (主题, 角色, 方向, 是否加速, 尺寸)
+
+    每种组合只用 draw 函数画一次，之后每帧只是一次 blit。
+    按最近使用顺序保存，超过 limit 个时淘汰最久没用过的。
+    """
+
+    def __init__(self, limit=SPRITE_CACHE_LIMIT):
+        self.limit = limit
+        self.sprites = OrderedDict()
+
+    def head(self, theme, role, direction, size, is_boosting=False):
+        """role 为 "p_head" / "e_head"；返回的图块四周带 HEAD_PAD 的留白"""
+        key = (theme["name"], role, direction, is_boosting, size)
+        sprite = self.lookup(key)
+        if sprite is None:
+            sprite = pygame.Surface((size + HEAD_PAD * 2, size + HEAD_PAD * 2), pygame.SRCALPHA)
+            draw_detailed_head(sprite, HEAD_PAD, HEAD_PAD, size, theme[role], direction, is_boosting)
+            sprite = self.store(key, sprite)
+        return sprite
+
+    def segment(self, theme, role, size, is_boosting=False, radius=8):
+        """role 为 "p_body" / "e_body"，加速时颜色提亮"""
+        key = (theme["name"], role, radius, is_boosting, size)
+        sprite = self.lookup(key)
+        if sprite is None:
+            color = [min(255, c + 40) for c in theme[role]] if is_boosting else theme[role]
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(sprite, color, (0, 0, size, size), border_radius=radius)
+            sprite = self.store(key, sprite)
+        return sprite
+
+    def prepare(self, theme, size):
+        """把 theme 下玩家 / 敌人各方向、加速与否的蛇头和蛇身先画好"""
+        for player in ("p", "e"):
+            for is_boosting in (False, True):
+                self.segment(theme, player + "_body", size, is_boosting)
+                for direction in (UP, DOWN, LEFT, RIGHT): self.head(theme, player + "_head", direction, size, is_boosting)
+
+    def lookup(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is not None: self.sprites.move_to_end(key)
+        return sprite
+
+    def store(self, key, sprite):
+        if pygame.display.get_surface(): sprite = sprite.convert_alpha()
+        self.sprites[key] = sprite
+        while len(self.sprites) > self.limit: self.sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+
+
+# --- 4. 文字缓存 ---
+class TextCache:
+    """文字图块缓存，键为 (字体, 文字, 颜色)
+
+    静态标签只光栅化一次；分数等变化的文字按最近使用顺序淘汰。
+    hits / misses 记录命中情况，hit_rate() 给出命中率。
+    """
+
+    def __init__(self, limit=TEXT_CACHE_LIMIT):
+        self.limit = limit
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, tuple(color))
+        surface = self.lookup(key)
+        if surface is None:
+            surface = self.store(key, font.render(text, True, color))
+        return surface
+
+    def outlined(self, font, text, color, outline=(0, 0, 0), offset=2):
+        """预先合成的描边文字：阴影在右下方 offset 像素处，图块左上角即正文位置"""
+        key = (font, text, tuple(color), tuple(outline), offset)
+        surface = self.lookup(key)
+        if surface is None:
+            fill = font.render(text, True, color)
+            shadow = font.render(text, True, outline)
+            surface = pygame.Surface((fill.get_width() + offset, fill.get_height() + offset), pygame.SRCALPHA)
+            surface.blit(shadow, (offset, offset))
+            surface.blit(fill, (0, 0))
+            surface = self.store(key, surface)
+        return surface
+
+    def lookup(self, key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def store(self, key, surface):
+        self.surfaces[key] = surface
+        while len(self.surfaces) > self.limit: self.surfaces.popitem(last=False)
+        return surface
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# --- 5. 脏矩形 ---
+class DirtyRects:
+    """脏矩形模式：只把本帧和上一帧画过的区域提交给 display.update
+
+    绘制时用 mark 记下每次 blit / draw 返回的矩形。下一帧先用背景层盖住上一帧的矩形，
+    再画新内容，两帧的矩形一起提交。状态或主题变化等整屏改变时 invalidate，
+    该帧退回整屏重画加 flip；关闭 enabled 时每帧都走整屏路径。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.rects = []
+        self.last = []
+        self.full = True
+        self.key = None
+
+    def mark(self, rect):
+        if self.enabled and rect: self.rects.append(rect)
+        return rect
+
+    def mark_all(self, rects):
+        if self.enabled: self.rects.extend(rects)
+
+    def invalidate(self):
+        self.full = True
+
+    def watch(self, key):
+        """key 变化 (状态、主题等) 时本帧整屏重画"""
+        if key != self.key:
+            self.key = key
+            self.full = True
+
+    def restore(self, screen, layer, themes, theme_index, shift=(0, 0)):
+        """非整屏重画的帧，画新内容之前把上一帧画过的区域还原成背景层 (BoardLayer) 的内容"""
+        for rect in self.last: layer.patch(screen, themes, theme_index, rect, shift)
+
+    def present(self):
+        # 两个列表轮流使用，每帧不新建列表
+        last = self.last
+        if self.full:
+            pygame.display.flip()
+        else:
+            last.extend(self.rects)
+            pygame.display.update(last)
+        last.clear()
+        self.last, self.rects = self.rects, last
+        self.full = not self.enabled
+
+
+# --- 6. 字体 ---
+class FontCache:
+    """按名称懒加载的字体，fonts["font"] 第一次取用时才打开
+
+    specs 把名称映射到 (候选字体名, 字号, 是否粗体)。按字体名查系统字体要枚举全部已安装字体，
+    很慢，所以解析出的文件路径存进 path 指向的 JSON 文件，之后启动直接按路径打开；
+    路径失效时重新解析。候选都找不到时用 pygame 自带的默认字体。
+    """
+
+    def __init__(self, specs, path=None, writer=None, timer=None):
+        self.specs = specs
+        self.path = path
+        self.writer = writer  # 有新解析结果时经它在后台写回缓存文件
+        self.timer = timer  # StartupTimer，懒加载的耗时记到 "fonts" 阶段
+        self.fonts = {}
+        paths = load_json(path, {}) if path else {}
+        self.paths = paths if isinstance(paths, dict) else {}
+
+    def __getitem__(self, name):
+        font = self.fonts.get(name)
+        if font is None:
+            start = time.perf_counter()
+            names, size, bold = self.specs[name]
+            path, fake_bold = self.resolve(names, bold)
+            font = self.fonts[name] = pygame.font.Font(path or None, size)
+            # 和 SysFont 一样，没有粗体字形时用合成粗体
+            if fake_bold: font.set_bold(True)
+            if self.timer: self.timer.add("fonts", (time.perf_counter() - start) * 1000)
+        return font
+
+    def resolve(self, names, bold):
+        """(字体文件路径, 是否需要合成粗体)；路径为空表示用默认字体"""
+        key = f"{','.join(names)}|{'bold' if bold else 'regular'}"
+        cached = self.paths.get(key)
+        if isinstance(cached, list) and len(cached) == 2 and (not cached[0] or os.path.exists(cached[0])):
+            return cached
+        path, fake_bold = "", bold
+        for name in names:
+            found = pygame.font.match_font(name, bold)
+            if found:
+                path = found
+                fake_bold = bold and found == pygame.font.match_font(name)
+                break
+        self.paths[key] = [path, fake_bold]
+        if self.writer and self.path: self.writer.submit_json(self.path, self.paths)
+        return path, fake_bold
@@ -0,0 +1,124 @@
+import bisect
+import json
+import struct
+import zlib
+
+from engine import Engine, DIRECTIONS
+
+# --- 1. 文件格式 ---
+# 文件头 | 输入记录 x n_inputs | 关键帧表 (tick, 字节数) x n_keyframes | 关键帧数据
+# 输入只在方向或加速状态变化的那一步记录；关键帧为 zlib 压缩的 Engine.snapshot() JSON
+REPLAY_MAGIC = b"SNKR"
+REPLAY_VERSION = 4
+KEYFRAME_INTERVAL = 300  # 每 300 步存一个关键帧
+NO_DIRECTION = 255
+
+HEADER = struct.Struct("<4sB16sHHQII")  # magic, version, difficulty, width, height, seed, n_inputs, n_keyframes
+INPUT = struct.Struct("<IBB")  # tick, 方向下标 (DIRECTIONS), 是否加速
+KEYFRAME = struct.Struct("<II")  # tick, 数据字节数
+
+
+def encode_direction(direction):
+    return NO_DIRECTION if direction is None else DIRECTIONS.index(direction)
+
+
+def decode_direction(code):
+    return None if code == NO_DIRECTION else DIRECTIONS[code]
+
+
+# --- 2. 回放数据 ---
+class Replay:
+    """一局的种子、按步编号的输入以及定期关键帧
+
+    engine_at(tick) 从不晚于 tick 的最近关键帧恢复后只补跑余下几步，不必从头模拟。
+    """
+
+    def __init__(self, difficulty, seed, width, height):
+        self.difficulty = difficulty
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.inputs = []  # (tick, direction, boost)，tick 递增
+        self.keyframes = []  # (tick, 快照 JSON)，tick 递增；只在写文件时压缩，录制中不占用帧时间
+
+    def add_input(self, tick, direction, boost):
+        self.inputs.append((tick, direction, boost))
+
+    def add_keyframe(self, tick, snapshot):
+        self.keyframes.append((tick, json.dumps(snapshot, separators=(",", ":")).encode()))
+
+    def input_at(self, tick):
+        """第 tick 步生效的输入 (最近一次记录)"""
+        i = bisect.bisect_right(self.inputs, tick, key=lambda e: e[0]) - 1
+        if i < 0: return None, False
+        return self.inputs[i][1], self.inputs[i][2]
+
+    def engine_at(self, tick):
+        """返回已走完 tick 步 (或已死亡) 的引擎"""
+        engine = Engine(self.difficulty, self.width, self.height)
+        i = bisect.bisect_right(self.keyframes, tick, key=lambda k: k[0]) - 1
+        if i >= 0:
+            engine.restore(json.loads(self.keyframes[i][1]))
+        else:
+            engine.reset(self.difficulty, self.seed)
+        while engine.alive and engine.ticks < tick:
+            direction, boost = self.input_at(engine.ticks)
+            engine.step(direction, boost)
+        return engine
+
+    def to_bytes(self):
+        parts = [HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.difficulty.encode(), self.width, self.height,
+                             self.seed, len(self.inputs), len(self.keyframes))]
+        for tick, direction, boost in self.inputs:
+            parts.append(INPUT.pack(tick, encode_direction(direction), boost))
+        packed = [zlib.compress(data) for tick, data in self.keyframes]
+        for (tick, _), data in zip(self.keyframes, packed):
+            parts.append(KEYFRAME.pack(tick, len(data)))
+        parts.extend(packed)
+        return b"".join(parts)
+
+    def save(self, path):
+        with open(path, 'wb') as f: f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, difficulty, width, height, seed, n_inputs, n_keyframes = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"not a version {REPLAY_VERSION} replay file: {path}")
+        replay = cls(difficulty.rstrip(b"\0").decode(), seed, width, height)
+        offset = HEADER.size
+        for tick, code, boost in INPUT.iter_unpack(data[offset:offset + INPUT.size * n_inputs]):
+            replay.add_input(tick, decode_direction(code), bool(boost))
+        offset += INPUT.size * n_inputs
+        table = list(KEYFRAME.iter_unpack(data[offset:offset + KEYFRAME.size * n_keyframes]))
+        offset += KEYFRAME.size * n_keyframes
+        for tick, size in table:
+            replay.keyframes.append((tick, zlib.decompress(data[offset:offset + size])))
+            offset += size
+        return replay
+
+
+# --- 3. 录制 ---
+class ReplayRecorder:
+    """每次 engine.step 之前调用 record，只在输入变化时记一条，并按间隔存关键帧"""
+
+    def __init__(self, engine, interval=KEYFRAME_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self.replay = Replay(engine.difficulty, engine.seed, engine.width, engine.height)
+        self.last = None
+
+    def record(self, direction):
+        engine = self.engine
+        tick = engine.ticks
+        if tick and tick % self.interval == 0 and (not self.replay.keyframes or self.replay.keyframes[-1][0] != tick):
+            self.replay.add_keyframe(tick, engine.snapshot())
+        entry = (direction, engine.is_boosting)
+        if entry != self.last:
+            self.replay.add_input(tick, direction, engine.is_boosting)
+            self.last = entry
+
+    def save(self, path):
+        self.replay.save(path)
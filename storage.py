@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+
+# --- 1. 原子写入 ---
+def write_atomic(path, data):
+    """先写同目录下的临时文件并落盘，再 os.replace 覆盖目标；中途崩溃时原文件保持完整"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+
+def load_json(path, default):
+    """读取 JSON 文件；文件不存在时返回 default，损坏或无法读取时给出警告后返回 default"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"warning: could not read {path}: {e}", file=sys.stderr)
+        return default
+
+
+# --- 2. 后台写盘 ---
+class BackgroundWriter:
+    """后台写盘线程，帧循环只把数据交给它而不等磁盘
+
+    submit 只记下每个路径最新的一份数据并唤醒线程，连续多次提交只会写最后一份。
+    call 排队一个函数调用 (如写数据库)，按提交顺序在后台执行、不合并。
+    close 会等待尚未写出的数据全部落盘。
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.tasks = []
+        self.cond = threading.Condition()
+        self.busy = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="snake-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, path, data):
+        with self.cond:
+            self.pending[path] = data
+            self.cond.notify_all()
+
+    def call(self, fn, *args):
+        with self.cond:
+            self.tasks.append((fn, args))
+            self.cond.notify_all()
+
+    def submit_json(self, path, obj):
+        # 提交时就序列化，之后对 obj 的修改不影响这次写入
+        self.submit(path, json.dumps(obj).encode())
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.tasks and not self.closed: self.cond.wait()
+                if not self.pending and not self.tasks: return
+                batch, self.pending = self.pending, {}
+                tasks, self.tasks = self.tasks, []
+                self.busy = True
+            # 单个任务出错只记一条警告，busy 一定会清掉，flush() 不会因此一直等下去
+            try:
+                for path, data in batch.items():
+                    try:
+                        write_atomic(path, data)
+                    except Exception as e:
+                        print(f"warning: could not write {path}: {e!r}", file=sys.stderr)
+                for fn, args in tasks:
+                    try:
+                        fn(*args)
+                    except Exception as e:
+                        print(f"warning: background task {fn.__name__} failed: {e!r}", file=sys.stderr)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def flush(self):
+        """等待目前提交的数据全部写完"""
+        with self.cond:
+            while self.pending or self.tasks or self.busy: self.cond.wait()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+
+# --- 3. 对局历史 ---
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    score INTEGER NOT NULL,
+    difficulty TEXT NOT NULL,
+    theme TEXT NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    cause TEXT
+);
+CREATE INDEX IF NOT EXISTS games_score ON games (score DESC);
+CREATE INDEX IF NOT EXISTS games_difficulty_theme_score ON games (difficulty, theme, score DESC);
+CREATE INDEX IF NOT EXISTS games_theme_score ON games (theme, score DESC);
+"""
+
+
+class HistoryStore:
+    """只追加的对局历史 (SQLite)
+
+    连接在第一次查询或写入时才打开，启动时不读取任何历史。
+    排行榜按 (难度, 主题, 分数) 索引分页查询，读出的行数只与页大小有关。
+    写入通常经由 BackgroundWriter.call 在后台线程执行，连接用锁保护。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.executescript(HISTORY_SCHEMA)
+        return self.conn
+
+    def add(self, score, difficulty, theme, duration_ms, cause, played_at=None):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("INSERT INTO games (played_at, score, difficulty, theme, duration_ms, cause) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (time.time() if played_at is None else played_at, score, difficulty, theme,
+                              duration_ms, cause))
+
+    @staticmethod
+    def where(difficulty=None, theme=None):
+        clauses, params = [], []
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            params.append(difficulty)
+        if theme is not None:
+            clauses.append("theme = ?")
+            params.append(theme)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def top(self, k=10, offset=0, difficulty=None, theme=None):
+        """按分数从高到低的第 offset 名起 k 条：(score, difficulty, theme, duration_ms, cause, played_at)"""
+        where, params = self.where(difficulty, theme)
+        with self.lock:
+            return self.connect().execute(
+                "SELECT score, difficulty, theme, duration_ms, cause, played_at FROM games" + where +
+                " ORDER BY score DESC, id LIMIT ? OFFSET ?", params + [k, offset]).fetchall()
+
+    def summary(self, difficulty=None, theme=None):
+        """(局数, 最高分, 平均分, 平均时长毫秒)，没有记录时后三项为 None"""
+        where, params = self.where(difficulty, theme)
+        with self.lock:
+            return self.connect().execute(
+                "SELECT COUNT(*), MAX(score), AVG(score), AVG(duration_ms) FROM games" + where, params).fetchone()
+
+    def aggregates(self, by="difficulty"):
+        """按难度或主题分组的 (分组, 局数, 最高分, 平均分)"""
+        if by not in ("difficulty", "theme"): raise ValueError(f"cannot group by {by!r}")
+        with self.lock:
+            return self.connect().execute(
+                f"SELECT {by}, COUNT(*), MAX(score), AVG(score) FROM games GROUP BY {by} ORDER BY {by}").fetchall()
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None